@@ -0,0 +1,250 @@
+"""
+ANN 召回率与延迟评测
+以已存储向量的暴力检索结果为基准，对一组 HNSW 参数分别建索引，
+报告 recall@k 与 p50/p99 查询延迟，用实测数据选择参数
+
+推荐用 --queries-file 提供一组真实的文本查询 (每行一条)，经 Chinese-CLIP 编码后
+与线上 /api/search 的查询分布一致；未提供时从已存储向量中抽样做以图搜图，
+只适合粗略比较参数 (查询自身会从基准和检索结果中排除)
+
+用法:
+    python -m backend.ann_eval --k 20 --queries-file queries.txt \\
+        --M 8,16,32 --construction-ef 100,200 --search-ef 10,50,100
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import chromadb
+from chromadb.config import Settings
+
+from .config import CHROMA_DIR, HNSW_M, HNSW_CONSTRUCTION_EF, HNSW_SEARCH_EF, MODEL_NAME
+from .database import hnsw_metadata, REGISTRY_FILE, LEGACY_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 5000
+
+
+def open_serving_collection(model_name: str):
+    """
+    只读方式打开某个模型当前服务的集合
+
+    不经过 VectorDatabase 初始化，避免在服务运行时回收其正在重建的影子集合
+    """
+    client = chromadb.PersistentClient(path=str(CHROMA_DIR), settings=Settings(anonymized_telemetry=False))
+    registry_path = CHROMA_DIR / REGISTRY_FILE
+
+    name = LEGACY_COLLECTION
+    if registry_path.exists():
+        with open(registry_path, encoding="utf-8") as f:
+            registry = json.load(f).get("active", {})
+        if model_name not in registry:
+            raise ValueError(f"模型 {model_name} 没有对应的索引集合")
+        name = registry[model_name]
+
+    return client.get_collection(name)
+
+
+def load_embeddings(collection) -> Tuple[List[str], np.ndarray]:
+    """
+    分页读取集合中的全部向量
+
+    Returns:
+        (ids, 归一化后的向量矩阵 (N, D))
+    """
+    ids = []
+    chunks = []
+    total = collection.count()
+
+    for offset in range(0, total, PAGE_SIZE):
+        page = collection.get(include=["embeddings"], limit=PAGE_SIZE, offset=offset)
+        ids.extend(page["ids"])
+        chunks.append(np.asarray(page["embeddings"], dtype=np.float32))
+
+    if not chunks:
+        return [], np.zeros((0, 0), dtype=np.float32)
+
+    matrix = np.concatenate(chunks)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return ids, matrix
+
+
+def exact_top_k(queries: np.ndarray, matrix: np.ndarray, k: int, chunk_size: int = 256) -> np.ndarray:
+    """
+    暴力检索每个查询的余弦相似度 Top-K (分块计算以控制内存)
+
+    Returns:
+        行索引矩阵 (Q, k)，按相似度降序
+    """
+    k = min(k, len(matrix))
+    result = np.empty((len(queries), k), dtype=np.int64)
+
+    for start in range(0, len(queries), chunk_size):
+        scores = queries[start:start + chunk_size] @ matrix.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        result[start:start + chunk_size] = np.take_along_axis(top, order, axis=1)
+
+    return result
+
+
+def evaluate_setting(client, ids: List[str], matrix: np.ndarray, queries: np.ndarray,
+                     ground_truth: List[set], k: int, hnsw: Dict[str, int],
+                     query_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    用一组 HNSW 参数建临时索引并测量召回率和延迟
+
+    Args:
+        query_ids: 查询取自已存储向量时各查询自身的 ID，从检索结果中排除
+
+    Returns:
+        {'hnsw', 'build_seconds', 'recall', 'p50_ms', 'p99_ms'}
+    """
+    name = f"ann_eval_{hnsw['M']}_{hnsw['construction_ef']}_{hnsw['search_ef']}"
+    collection = client.create_collection(name=name, metadata=hnsw_metadata(hnsw))
+
+    try:
+        started = time.perf_counter()
+        for offset in range(0, len(ids), PAGE_SIZE):
+            collection.add(
+                ids=ids[offset:offset + PAGE_SIZE],
+                embeddings=matrix[offset:offset + PAGE_SIZE].tolist()
+            )
+        build_seconds = time.perf_counter() - started
+
+        latencies = []
+        hits = 0
+        n_results = k + 1 if query_ids else k
+        for i, (query, expected) in enumerate(zip(queries, ground_truth)):
+            started = time.perf_counter()
+            found = collection.query(query_embeddings=[query.tolist()], n_results=n_results, include=[])
+            latencies.append((time.perf_counter() - started) * 1000)
+            found_ids = found["ids"][0]
+            if query_ids:
+                found_ids = [found_id for found_id in found_ids if found_id != query_ids[i]][:k]
+            hits += len(expected.intersection(found_ids))
+    finally:
+        client.delete_collection(name)
+
+    return {
+        "hnsw": hnsw,
+        "build_seconds": round(build_seconds, 2),
+        "recall": round(hits / sum(len(e) for e in ground_truth), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3)
+    }
+
+
+def run_evaluation(collection, k: int, num_queries: int, grid: Dict[str, List[int]],
+                   query_texts: Optional[List[str]] = None, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    对参数网格逐项评测
+
+    Args:
+        collection: 提供向量的 ChromaDB 集合
+        k: 评测的 Top-K
+        num_queries: 未提供文本查询时，从已存储向量中抽样的查询数
+        grid: {'M': [...], 'construction_ef': [...], 'search_ef': [...]}
+        query_texts: 文本查询 (使用 Chinese-CLIP 编码，与线上 /api/search 的分布一致，推荐)
+        seed: 抽样随机种子
+
+    Returns:
+        每组参数的评测结果
+    """
+    ids, matrix = load_embeddings(collection)
+    if len(ids) == 0:
+        raise ValueError(f"集合 {collection.name} 为空，无法评测")
+    logger.info(f"已读取 {len(ids)} 个向量 (维度 {matrix.shape[1]})")
+
+    query_ids = None
+    if query_texts:
+        from .models import CLIPModelManager
+        model = CLIPModelManager()
+        queries = np.stack([model.encode_text(text) for text in query_texts]).astype(np.float32)
+        k = min(k, len(ids))
+    else:
+        if len(ids) < 2:
+            raise ValueError(f"集合 {collection.name} 向量过少，无法抽样评测")
+        rng = np.random.default_rng(seed)
+        picked = rng.choice(len(ids), size=min(num_queries, len(ids)), replace=False)
+        queries = matrix[picked]
+        # 查询自身必然命中，排除后才能反映真实召回率
+        query_ids = [ids[i] for i in picked]
+        k = min(k, len(ids) - 1)
+
+    started = time.perf_counter()
+    if query_ids:
+        # 多取一个，去掉查询自身后保留前 k 个 (重复图片并列时自身不一定排在第一)
+        ground_truth = [
+            set([ids[j] for j in row if ids[j] != query_id][:k])
+            for row, query_id in zip(exact_top_k(queries, matrix, k + 1), query_ids)
+        ]
+    else:
+        ground_truth = [{ids[i] for i in row} for row in exact_top_k(queries, matrix, k)]
+    logger.info(f"暴力检索基准完成: {len(queries)} 个查询，耗时 {time.perf_counter() - started:.2f}s")
+
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False, allow_reset=True))
+    results = []
+    for m, construction_ef, search_ef in itertools.product(grid["M"], grid["construction_ef"], grid["search_ef"]):
+        hnsw = {"M": m, "construction_ef": construction_ef, "search_ef": search_ef}
+        result = evaluate_setting(client, ids, matrix, queries, ground_truth, k, hnsw, query_ids=query_ids)
+        logger.info(f"{hnsw}: recall@{k}={result['recall']:.4f} p50={result['p50_ms']}ms p99={result['p99_ms']}ms")
+        results.append(result)
+
+    return results
+
+
+def _int_list(value: str) -> List[int]:
+    """解析逗号分隔的整数列表"""
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MemoryHunter ANN 召回率/延迟评测")
+    parser.add_argument("--k", type=int, default=20, help="评测的 Top-K")
+    parser.add_argument("--queries", type=int, default=200, help="从已存储向量中抽样的查询数")
+    parser.add_argument("--queries-file", default=None,
+                        help="文本查询文件 (每行一条)，推荐: 反映线上文本搜索；提供时替代抽样查询")
+    parser.add_argument("--M", type=_int_list, default=[HNSW_M], help="M 取值，逗号分隔")
+    parser.add_argument("--construction-ef", type=_int_list, default=[HNSW_CONSTRUCTION_EF], help="construction_ef 取值")
+    parser.add_argument("--search-ef", type=_int_list, default=[HNSW_SEARCH_EF], help="search_ef 取值")
+    parser.add_argument("--model", default=MODEL_NAME, help="读取该模型当前服务的集合")
+    parser.add_argument("--seed", type=int, default=0, help="抽样随机种子")
+    parser.add_argument("--output", default=None, help="结果 JSON 输出路径")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    collection = open_serving_collection(args.model)
+
+    query_texts = None
+    if args.queries_file:
+        with open(args.queries_file, encoding="utf-8") as f:
+            query_texts = [line.strip() for line in f if line.strip()]
+
+    grid = {"M": args.M, "construction_ef": args.construction_ef, "search_ef": args.search_ef}
+    results = run_evaluation(collection, args.k, args.queries, grid, query_texts=query_texts, seed=args.seed)
+
+    print(f"\n{'M':>4} {'constr_ef':>10} {'search_ef':>10} {'recall@' + str(args.k):>10} "
+          f"{'p50(ms)':>9} {'p99(ms)':>9} {'build(s)':>9}")
+    for r in results:
+        h = r["hnsw"]
+        print(f"{h['M']:>4} {h['construction_ef']:>10} {h['search_ef']:>10} {r['recall']:>10.4f} "
+              f"{r['p50_ms']:>9.3f} {r['p99_ms']:>9.3f} {r['build_seconds']:>9.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"k": args.k, "collection": collection.name, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@
 仅启用轻量级 CLIP 模型
 """
 
+import os
 from pathlib import Path
 
 # ============ 路径配置 ============
@@ -20,11 +21,20 @@ ENABLE_HYBRID_SEARCH = False
 MODEL_NAME = "OFA-Sys/chinese-clip-vit-base-patch16"
 DEVICE = "cpu"                             # Mac 推荐使用 CPU
 BATCH_SIZE = 4                             # 小批次以节省内存
+FAST_PREPROCESS = True                     # 使用批量张量预处理替代逐图处理器
+PREPROCESS_TOLERANCE = 1e-4                # 与处理器输出的最大允许误差 (启动时校验)
 
 # ============ 搜索配置 ============
 TOP_K = 20
 SIMILARITY_THRESHOLD = 0.2
 
+# ============ 向量索引 (HNSW) ============
+# 新建集合时使用的默认参数，重建时可按集合覆盖 (见 /api/index/rebuild)
+HNSW_SPACE = "cosine"
+HNSW_M = 16                                # 每个节点的邻居数，越大召回越高、内存越多
+HNSW_CONSTRUCTION_EF = 100                 # 建图时的候选集大小
+HNSW_SEARCH_EF = 10                        # 查询时的候选集大小 (实际取 max(search_ef, k))
+
 # ============ 图片格式 ============
 SUPPORTED_FORMATS = {
     ".jpg", ".jpeg", ".png", ".webp", ".heic",
@@ -33,8 +43,36 @@ SUPPORTED_FORMATS = {
 
 # ============ 性能优化 ============
 ENABLE_CACHE = True
-CACHE_SIZE = 50
+CACHE_SIZE = 50                            # 最多缓存的分页游标数
+CURSOR_DEPTH = 500                         # 首次搜索计算的候选结果深度
+CURSOR_TTL_SECONDS = 300                   # 游标有效期 (秒)
 NUM_WORKERS = 2
 
+# ============ 内存调控 (索引) ============
+# 索引进程的 RSS 预算 (MB)，默认留出约 1GB 给容器 4GB 上限中的搜索服务
+MEMORY_BUDGET_MB = int(os.getenv("MEMORY_BUDGET_MB", "3072"))
+MEMORY_SOFT_RATIO = 0.75                   # 超过预算的 75%: 缩小批次/队列
+MEMORY_HARD_RATIO = 0.90                   # 超过预算的 90%: 暂停读入新图片
+MEMORY_PAUSE_TIMEOUT = 30.0                # 单次暂停最长等待秒数
+MEMORY_PAUSE_REARM_RATIO = 0.05            # 暂停超时后，RSS 再增长预算的 5% 才会再次暂停
+INDEX_QUEUE_SIZE = 8                       # 预解码图片队列上限
+DECODE_SHORT_SIDE = 448                    # 解码时短边上限 (模型输入为 224)
+DECODE_SHORT_SIDE_MIN = 224                # 内存紧张时的短边上限
+
+# ============ 影子重建 ============
+REBUILD_MAX_FAILURE_RATIO = 0.2            # 重建失败率超过该比例时放弃切换，保留当前索引
+COLLECTION_DROP_TIMEOUT = 30.0             # 回收旧集合前等待进行中查询结束的最长秒数
+
+# ============ 分布式索引 ============
+WORK_QUEUE_PATH = CHROMA_DIR / "work_queue.sqlite3"
+WORK_UNIT_SIZE = 32                        # 每个工作单元的图片数
+WORK_LEASE_SECONDS = 300.0                 # 租约时长，超时后单元重新分配
+WORK_MAX_ATTEMPTS = 3                      # 单元最多被领取次数
+
+# ============ 进度推送 (SSE) ============
+SSE_INTERVAL = 0.5                         # 推送节流间隔 (秒)
+SSE_KEEPALIVE = 15.0                       # 空闲保活间隔 (秒)
+SSE_STATS_INTERVAL = 5.0                   # 索引期间刷新图片总数的最小间隔 (秒)
+
 # ============ 日志配置 ============
 LOG_LEVEL = "INFO"
\ No newline at end of file
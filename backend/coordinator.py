@@ -0,0 +1,327 @@
+"""
+分布式索引协调器
+把扫描到的图片切分为工作单元放入持久化队列，由独立 worker 领取并编码；
+worker 只回传向量，协调器是唯一写入向量数据库的进程
+"""
+
+import logging
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable
+
+from .config import PHOTOS_DIR, WORK_UNIT_SIZE
+from .indexer import build_metadata
+from .workqueue import WorkQueue, JOB_FINISHED
+
+logger = logging.getLogger(__name__)
+
+
+class IndexCoordinator:
+    """分布式索引协调器"""
+
+    def __init__(self, indexer, vector_db, queue: WorkQueue):
+        """
+        初始化协调器
+
+        Args:
+            indexer: ImageIndexer 实例 (用于扫描相册)
+            vector_db: VectorDatabase 实例
+            queue: WorkQueue 实例
+        """
+        self.indexer = indexer
+        self.db = vector_db
+        self.queue = queue
+        self._lock = threading.Lock()
+
+        self.job_id = None
+        self.rebuild = False
+        self.target = None
+        self.total = 0
+        self.skipped = 0
+
+        self.progress_callback = None
+        self.failure_callback = None
+        self.done_callback = None
+
+        self._recover()
+
+    def _recover(self):
+        """启动时处理上次未完成的任务"""
+        job = self.queue.get_active_job()
+        if job is None:
+            return
+
+        if job["rebuild"]:
+            # 影子集合已在数据库初始化时回收，重建任务无法续跑
+            logger.warning(f"上次的分布式重建任务 {job['id'][:8]} 未完成，已取消")
+            self.queue.cancel_job(job["id"])
+            return
+
+        logger.info(f"♻️ 恢复未完成的分布式索引任务 {job['id'][:8]}")
+        self.job_id = job["id"]
+        # 总数、跳过数和各单元的成功数都已持久化，恢复后统计保持连续
+        self.total = job["total"]
+        self.skipped = job["skipped"]
+        self.target = self.db.collection
+
+    @property
+    def is_active(self) -> bool:
+        """是否有正在运行的分布式任务"""
+        return self.job_id is not None
+
+    def set_callbacks(self,
+                      progress_callback: Optional[Callable[[int, int], None]] = None,
+                      failure_callback: Optional[Callable[[str, str], None]] = None,
+                      done_callback: Optional[Callable[[dict], None]] = None):
+        """
+        设置进度回调
+
+        Args:
+            progress_callback: 进度回调 (current, total)
+            failure_callback: 失败回调 (path, error)
+            done_callback: 任务结束回调 (result)
+        """
+        self.progress_callback = progress_callback
+        self.failure_callback = failure_callback
+        self.done_callback = done_callback
+
+    def start_job(self, rebuild: bool = False, unit_size: int = WORK_UNIT_SIZE,
+                  hnsw: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """
+        扫描相册并创建分布式索引任务
+
+        Args:
+            rebuild: True 时写入影子集合，全部完成后原子切换
+            unit_size: 每个工作单元的图片数
+            hnsw: 重建时新集合的 HNSW 参数覆盖
+
+        Returns:
+            任务状态
+        """
+        with self._lock:
+            if self.job_id is not None:
+                raise RuntimeError(f"分布式任务 {self.job_id[:8]} 正在进行中")
+
+            photos = [str(p) for p in self.indexer.scan_photos()]
+            if rebuild:
+                self.target = self.db.begin_shadow(hnsw=hnsw)
+                paths = photos
+            else:
+                self.target = self.db.collection
+                existing = self.db.existing_paths(photos, collection=self.target)
+                paths = [p for p in photos if p not in existing]
+
+            try:
+                job_id = self.queue.create_job(paths, unit_size, rebuild=rebuild,
+                                               skipped=len(photos) - len(paths))
+            except Exception:
+                # 不回收影子集合的话，之后的所有重建都会被拒绝
+                if rebuild:
+                    self.db.abort_shadow()
+                self.target = None
+                raise
+
+            self.rebuild = rebuild
+            self.total = len(photos)
+            self.skipped = len(photos) - len(paths)
+            self.job_id = job_id
+
+        self._report_progress()
+        self._check_finished()
+        return self.get_status()
+
+    def lease(self, worker_id: str, model_name: str) -> Optional[Dict[str, Any]]:
+        """
+        为 worker 分配一个工作单元
+
+        Args:
+            worker_id: worker 标识
+            model_name: worker 加载的模型，必须与当前集合一致
+
+        Returns:
+            工作单元 {'unit_id', 'items', 'lease_expires'}，当前无可分配单元时返回 None
+        """
+        self._check_model(model_name)
+
+        # 与 complete 互斥: 否则过期单元可能在其校验租约后、标记完成前被重新分配
+        with self._lock:
+            if self.job_id is None:
+                return None
+            unit = self.queue.lease(worker_id, self.job_id)
+
+        if unit is None:
+            # 可能有单元因超过领取次数而失败，检查任务是否已结束
+            self._check_finished()
+            return None
+
+        unit["items"] = [
+            {"path": path, "url": self._photo_url(path)}
+            for path in unit.pop("paths")
+        ]
+        return unit
+
+    def complete(self, worker_id: str, model_name: str, unit_id: int,
+                 results: List[Dict[str, Any]], failures: List[Dict[str, str]]) -> bool:
+        """
+        接收 worker 回传的向量并写入数据库
+
+        Args:
+            worker_id: worker 标识
+            model_name: worker 加载的模型
+            unit_id: 工作单元 ID
+            results: [{'path', 'embedding'}]
+            failures: [{'path', 'error'}]
+
+        Returns:
+            True 表示已写入，False 表示租约已被重新分配，结果被丢弃
+
+        Raises:
+            ValueError: 模型不一致或向量维度错误
+        """
+        self._check_model(model_name)
+        self._check_dimensions(results)
+
+        with self._lock:
+            if self.job_id is None or not self.queue.owns_lease(unit_id, worker_id, self.job_id):
+                logger.warning(f"丢弃 worker {worker_id} 的单元 {unit_id} 结果: 租约已失效")
+                return False
+
+            results, failures = self._restrict_to_unit(unit_id, worker_id, results, failures)
+
+            if results:
+                self.db.add_images(
+                    paths=[r["path"] for r in results],
+                    embeddings=[r["embedding"] for r in results],
+                    metadatas=[build_metadata(Path(r["path"])) for r in results],
+                    collection=self.target
+                )
+            if not self.queue.complete(unit_id, worker_id, self.job_id, success=len(results)):
+                logger.error(f"单元 {unit_id} 标记完成失败: 租约已不属于 worker {worker_id}")
+                return False
+
+        if self.failure_callback:
+            for failure in failures:
+                self.failure_callback(failure["path"], failure["error"])
+
+        self._report_progress()
+        self._check_finished()
+        return True
+
+    def cancel(self):
+        """取消当前任务 (重建任务的影子集合会被回收)"""
+        with self._lock:
+            if self.job_id is None:
+                return
+            self.queue.cancel_job(self.job_id)
+            if self.rebuild:
+                self.db.abort_shadow()
+            logger.warning(f"分布式任务 {self.job_id[:8]} 已取消")
+            self.job_id = None
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取当前任务状态"""
+        job_id = self.job_id
+        if job_id is None:
+            return {"active": False}
+
+        return {
+            "active": True,
+            "job_id": job_id,
+            "rebuild": self.rebuild,
+            "total": self.total,
+            "skipped": self.skipped,
+            "units": self.queue.job_progress(job_id)
+        }
+
+    def _check_model(self, model_name: str):
+        """拒绝与当前集合模型不一致的 worker，避免混入不兼容的向量"""
+        if model_name != self.db.model_name:
+            raise ValueError(f"worker 模型 {model_name} 与协调器模型 {self.db.model_name} 不一致")
+
+    def _check_dimensions(self, results: List[Dict[str, Any]]):
+        """拒绝维度与模型输出不一致的向量"""
+        expected = self.indexer.model.get_info()["embedding_dim"]
+        for r in results:
+            if len(r["embedding"]) != expected:
+                raise ValueError(f"{r['path']} 的向量维度 {len(r['embedding'])} 与模型维度 {expected} 不一致")
+
+    def _restrict_to_unit(self, unit_id: int, worker_id: str,
+                          results: List[Dict[str, Any]],
+                          failures: List[Dict[str, str]]):
+        """
+        只保留属于该单元的结果，避免 worker 写入未分配给它的路径
+
+        单元中既无结果也无失败记录的图片按失败处理
+
+        Returns:
+            (results, failures)
+        """
+        unit_paths = self.queue.unit_paths(unit_id, self.job_id)
+        allowed = set(unit_paths)
+
+        # 同一路径重复提交时只保留第一条
+        kept_results = list({r["path"]: r for r in reversed(results) if r["path"] in allowed}.values())[::-1]
+        kept_failures = [f for f in failures if f["path"] in allowed]
+        foreign = sum(1 for r in results if r["path"] not in allowed) + len(failures) - len(kept_failures)
+        if foreign:
+            logger.warning(f"忽略 worker {worker_id} 提交的 {foreign} 条不属于单元 {unit_id} 的记录")
+
+        reported = {r["path"] for r in kept_results} | {f["path"] for f in kept_failures}
+        kept_failures.extend(
+            {"path": path, "error": "worker 未返回结果"}
+            for path in unit_paths if path not in reported
+        )
+        return kept_results, kept_failures
+
+    def _photo_url(self, path: str) -> Optional[str]:
+        """图片在协调器上的访问路径 (供无法直接访问相册的 worker 下载)"""
+        try:
+            return "/photos/" + Path(path).relative_to(PHOTOS_DIR).as_posix()
+        except ValueError:
+            return None
+
+    def _report_progress(self):
+        """通过回调报告进度 (已跳过 + 已处理的图片)"""
+        job_id = self.job_id
+        if job_id is None or not self.progress_callback:
+            return
+        processed = self.queue.job_progress(job_id)["processed"]
+        self.progress_callback(self.skipped + processed, self.total)
+
+    def _check_finished(self):
+        """所有单元处理完毕时结束任务"""
+        with self._lock:
+            job_id = self.job_id
+            if job_id is None:
+                return
+
+            progress = self.queue.job_progress(job_id)
+            if progress["pending"] or progress["leased"]:
+                return
+
+            failed_paths = self.queue.failed_paths(job_id)
+            self.queue.set_job_status(job_id, JOB_FINISHED)
+            self.job_id = None
+
+            result = {
+                'total': self.total,
+                'success': progress["success"],
+                'failed': progress["processed"] - progress["success"],
+                'skipped': self.skipped
+            }
+
+            if self.rebuild:
+                reason = self.db.validate_shadow(result)
+                if reason:
+                    logger.error(f"❌ 分布式重建结果异常，保留当前索引: {reason}")
+                    self.db.abort_shadow()
+                    result['aborted'] = reason
+                else:
+                    self.db.commit_shadow()
+
+        logger.info(f"✅ 分布式任务 {job_id[:8]} 完成: {result}")
+        if self.failure_callback:
+            for path in failed_paths:
+                self.failure_callback(path, "工作单元多次超时")
+        if self.done_callback:
+            self.done_callback(result)
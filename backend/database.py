@@ -7,17 +7,64 @@ import chromadb
 from chromadb.config import Settings
 import logging
 import hashlib
-from typing import List, Dict, Any
-from .config import CHROMA_DIR
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+from .config import (
+    CHROMA_DIR, MODEL_NAME, REBUILD_MAX_FAILURE_RATIO, COLLECTION_DROP_TIMEOUT,
+    HNSW_SPACE, HNSW_M, HNSW_CONSTRUCTION_EF, HNSW_SEARCH_EF
+)
+
+# 旧版本使用的固定集合名 (不带模型标识)
+LEGACY_COLLECTION = "images"
+# 模型 -> 当前服务集合 的注册表
+REGISTRY_FILE = "collections.json"
+# 可按集合配置的 HNSW 参数
+HNSW_KEYS = ("M", "construction_ef", "search_ef")
+
+
+def hnsw_metadata(hnsw: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """
+    构建集合的 HNSW 元数据
+    
+    Args:
+        hnsw: 覆盖默认值的参数 {'M', 'construction_ef', 'search_ef'}
+        
+    Returns:
+        ChromaDB 集合元数据 (hnsw:* 键)
+    """
+    params = {"M": HNSW_M, "construction_ef": HNSW_CONSTRUCTION_EF, "search_ef": HNSW_SEARCH_EF}
+    for key, value in (hnsw or {}).items():
+        if key not in HNSW_KEYS:
+            raise ValueError(f"不支持的 HNSW 参数: {key}")
+        if value is not None:
+            params[key] = int(value)
+    
+    metadata = {"hnsw:space": HNSW_SPACE}  # 使用余弦相似度
+    metadata.update({f"hnsw:{key}": value for key, value in params.items()})
+    return metadata
 
 logger = logging.getLogger(__name__)
 
 
 class VectorDatabase:
-    """向量数据库管理器"""
+    """
+    向量数据库管理器
     
-    def __init__(self):
-        """初始化 ChromaDB"""
+    每个集合都带有生成其向量的模型标识，注册表记录每个模型当前服务的集合。
+    重建时先写入影子集合，完成后原子切换并回收旧集合，期间旧集合持续提供搜索。
+    """
+    
+    def __init__(self, model_name: str = MODEL_NAME):
+        """
+        初始化 ChromaDB
+        
+        Args:
+            model_name: 当前加载的模型标识，决定默认服务的集合
+        """
         try:
             logger.info(f"初始化 ChromaDB，存储路径: {CHROMA_DIR}")
             
@@ -33,18 +80,265 @@ class VectorDatabase:
                 )
             )
             
-            # 获取或创建集合
-            self.collection = self.client.get_or_create_collection(
-                name="images",
-                metadata={"hnsw:space": "cosine"}  # 使用余弦相似度
-            )
+            self.model_name = model_name
+            self.registry_path = CHROMA_DIR / REGISTRY_FILE
+            self._lock = threading.Lock()
+            self.shadow = None
+            # 集合名 -> 进行中的查询数，回收集合前等待其归零
+            self._readers = {}
+            self._readers_idle = threading.Condition(self._lock)
+            
+            # 注册表不可读或注册的集合丢失时，按集合元数据恢复且本次不回收任何集合
+            self._registry_trusted = True
+            
+            # 获取当前模型的服务集合
+            self.registry = self._load_registry()
+            self.collection = self._resolve_active()
             
-            logger.info(f"✅ ChromaDB 初始化成功，当前图片数: {self.collection.count()}")
+            # 回收崩溃遗留的影子集合
+            if self._registry_trusted:
+                self.garbage_collect()
+            else:
+                self._save_registry()
+                logger.warning("集合注册表已从元数据恢复，本次启动跳过集合回收")
+            
+            logger.info(f"✅ ChromaDB 初始化成功，集合: {self.collection.name}，当前图片数: {self.collection.count()}")
             
         except Exception as e:
             logger.error(f"❌ ChromaDB 初始化失败: {e}")
             raise
     
+    def _load_registry(self) -> Dict[str, str]:
+        """读取 模型 -> 集合名 注册表 (读取失败时从集合元数据恢复)"""
+        if not self.registry_path.exists():
+            return {}
+        try:
+            with open(self.registry_path, encoding='utf-8') as f:
+                return json.load(f).get("active", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取集合注册表失败，将根据集合元数据恢复: {e}")
+            self._registry_trusted = False
+            return self._recover_registry()
+    
+    def _recover_registry(self) -> Dict[str, str]:
+        """为每个模型选出带该模型标记的最新集合"""
+        latest = {}
+        for collection in self.client.list_collections():
+            model_name = (collection.metadata or {}).get("model_name")
+            if model_name is None:
+                continue
+            created_at = collection.metadata.get("created_at", 0)
+            if model_name not in latest or created_at > latest[model_name][0]:
+                latest[model_name] = (created_at, collection.name)
+        return {model_name: name for model_name, (_, name) in latest.items()}
+    
+    def _save_registry(self):
+        """原子写入注册表 (先写临时文件再替换)"""
+        tmp_path = self.registry_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding='utf-8') as f:
+            json.dump({"active": self.registry}, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.registry_path)
+    
+    def _new_collection(self, model_name: str, hnsw: Optional[Dict[str, int]] = None):
+        """
+        为指定模型创建一个新集合
+        
+        Args:
+            model_name: 模型标识
+            hnsw: HNSW 参数覆盖，默认使用配置值
+        """
+        model_hash = hashlib.md5(model_name.encode('utf-8')).hexdigest()[:8]
+        name = f"images_{model_hash}_{time.time_ns() // 1000}"
+        return self.client.create_collection(
+            name=name,
+            metadata={
+                **hnsw_metadata(hnsw),
+                "model_name": model_name,
+                "created_at": time.time()
+            }
+        )
+    
+    @staticmethod
+    def get_hnsw_params(collection) -> Dict[str, Any]:
+        """读取集合的 HNSW 参数 (未设置的项为 ChromaDB 默认值)"""
+        metadata = collection.metadata or {}
+        return {key[len("hnsw:"):]: value for key, value in metadata.items() if key.startswith("hnsw:")}
+    
+    def _resolve_active(self):
+        """获取当前模型的服务集合，不存在时创建"""
+        name = self.registry.get(self.model_name)
+        if name:
+            try:
+                return self.client.get_collection(name)
+            except Exception as e:
+                logger.warning(f"注册的集合 {name} 不可用: {e}")
+            
+            # 注册的集合丢失时沿用该模型最新的集合，而不是新建空集合
+            self._registry_trusted = False
+            adopted = self._recover_registry().get(self.model_name)
+            if adopted and adopted != name:
+                logger.warning(f"沿用模型 {self.model_name} 最新的集合 {adopted}")
+                self.registry[self.model_name] = adopted
+                self._save_registry()
+                return self.client.get_collection(adopted)
+        
+        existing = {c.name for c in self.client.list_collections()}
+        if not self.registry and LEGACY_COLLECTION in existing:
+            # 兼容旧版本: 沿用未标记模型的 images 集合
+            logger.warning(f"沿用旧集合 '{LEGACY_COLLECTION}'，视为模型 {self.model_name} 生成")
+            collection = self.client.get_collection(LEGACY_COLLECTION)
+        else:
+            if self.registry:
+                logger.warning(f"模型 {self.model_name} 尚无索引集合，请重建索引")
+            collection = self._new_collection(self.model_name)
+        
+        self.registry[self.model_name] = collection.name
+        self._save_registry()
+        return collection
+    
+    def get_collection(self, model_name: Optional[str] = None):
+        """
+        获取指定模型当前服务的集合
+        
+        Args:
+            model_name: 模型标识，默认为当前加载的模型
+            
+        Returns:
+            集合对象，该模型没有集合时返回 None
+        """
+        if model_name is None or model_name == self.model_name:
+            return self.collection
+        name = self.registry.get(model_name)
+        return self.client.get_collection(name) if name else None
+    
+    def begin_shadow(self, hnsw: Optional[Dict[str, int]] = None):
+        """
+        创建影子集合用于后台重建
+        
+        Args:
+            hnsw: 新集合的 HNSW 参数覆盖 (M / construction_ef / search_ef)
+        
+        Returns:
+            新建的影子集合
+        """
+        with self._lock:
+            if self.shadow is not None:
+                raise RuntimeError(f"影子集合 {self.shadow.name} 正在重建中")
+            self.shadow = self._new_collection(self.model_name, hnsw=hnsw)
+        logger.info(f"🌗 开始影子重建: {self.shadow.name}")
+        return self.shadow
+    
+    def validate_shadow(self, result: Dict[str, int]) -> Optional[str]:
+        """
+        检查重建结果是否可以替换当前集合
+        
+        当前集合非空时，扫描为空、没有任何成功或失败率过高的重建都不应切换，
+        否则一次挂载失败或编码器故障就会清空搜索
+        
+        Args:
+            result: 索引结果 {'total', 'success', 'failed', ...}
+            
+        Returns:
+            拒绝切换的原因，可以切换时返回 None
+        """
+        if self.collection.count() == 0:
+            return None
+        
+        if result.get('total', 0) == 0:
+            return "未扫描到任何图片 (相册目录可能未挂载)"
+        if result.get('success', 0) == 0:
+            return f"没有图片索引成功 (失败 {result.get('failed', 0)} 张)"
+        
+        attempted = result['success'] + result.get('failed', 0)
+        failure_ratio = result.get('failed', 0) / attempted
+        if failure_ratio > REBUILD_MAX_FAILURE_RATIO:
+            return f"失败率 {failure_ratio:.0%} 超过 {REBUILD_MAX_FAILURE_RATIO:.0%}"
+        
+        return None
+    
+    def commit_shadow(self):
+        """原子切换到影子集合并回收旧集合"""
+        with self._lock:
+            if self.shadow is None:
+                raise RuntimeError("没有正在重建的影子集合")
+            old = self.collection
+            self.collection = self.shadow
+            self.shadow = None
+            self.registry[self.model_name] = self.collection.name
+            self._save_registry()
+        
+        logger.info(f"✅ 已切换到集合 {self.collection.name} ({self.collection.count()} 张图片)")
+        self._drop_collection(old.name)
+        
+        # 当前模型已有完整索引，其他模型 (如切换 MODEL_NAME 前) 的集合不再需要
+        self.prune_other_models()
+    
+    def prune_other_models(self):
+        """从注册表移除其他模型的条目并回收其集合"""
+        with self._lock:
+            stale = {model: name for model, name in self.registry.items() if model != self.model_name}
+            if not stale:
+                return
+            for model in stale:
+                del self.registry[model]
+            self._save_registry()
+        
+        for model, name in stale.items():
+            logger.info(f"回收模型 {model} 的旧集合")
+            self._drop_collection(name)
+    
+    def abort_shadow(self):
+        """放弃影子集合，继续使用旧集合"""
+        with self._lock:
+            shadow, self.shadow = self.shadow, None
+        if shadow is not None:
+            logger.warning(f"放弃影子重建: {shadow.name}")
+            self._drop_collection(shadow.name)
+    
+    def garbage_collect(self):
+        """
+        删除既不在注册表中、也不在重建中的集合
+        
+        其他模型的注册集合在当前模型完成一次重建后由 prune_other_models 回收
+        """
+        keep = set(self.registry.values())
+        if self.shadow is not None:
+            keep.add(self.shadow.name)
+        
+        for collection in self.client.list_collections():
+            if collection.name not in keep:
+                self._drop_collection(collection.name)
+    
+    @contextmanager
+    def _reading(self, model_name: Optional[str] = None):
+        """取得模型当前服务的集合并登记为读者，期间该集合不会被回收"""
+        with self._lock:
+            collection = self.get_collection(model_name)
+            if collection is not None:
+                self._readers[collection.name] = self._readers.get(collection.name, 0) + 1
+        try:
+            yield collection
+        finally:
+            if collection is not None:
+                with self._lock:
+                    self._readers[collection.name] -= 1
+                    if self._readers[collection.name] == 0:
+                        del self._readers[collection.name]
+                    self._readers_idle.notify_all()
+    
+    def _drop_collection(self, name: str):
+        """删除集合 (先等待进行中的查询结束；失败时只记录日志，下次启动再回收)"""
+        with self._lock:
+            if not self._readers_idle.wait_for(lambda: name not in self._readers, timeout=COLLECTION_DROP_TIMEOUT):
+                logger.warning(f"集合 {name} 仍有查询未结束，超过 {COLLECTION_DROP_TIMEOUT:.0f}s 后强制回收")
+        try:
+            self.client.delete_collection(name)
+            logger.info(f"🗑️ 已回收集合: {name}")
+        except Exception as e:
+            logger.warning(f"回收集合失败 {name}: {e}")
+    
     def _generate_image_id(self, path: str) -> str:
         """
         生成稳定且唯一的图片ID
@@ -62,7 +356,8 @@ class VectorDatabase:
         """
         return hashlib.md5(path.encode('utf-8')).hexdigest()
     
-    def add_images(self, paths: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]]):
+    def add_images(self, paths: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]],
+                   collection=None):
         """
         批量添加图片向量
         
@@ -70,12 +365,13 @@ class VectorDatabase:
             paths: 图片路径列表
             embeddings: 特征向量列表
             metadatas: 元数据列表
+            collection: 目标集合，默认为当前服务集合 (重建时传入影子集合)
         """
         try:
             # 使用MD5生成稳定唯一的ID
             ids = [self._generate_image_id(p) for p in paths]
             
-            self.collection.add(
+            (collection if collection is not None else self.collection).add(
                 ids=ids,
                 embeddings=embeddings,
                 metadatas=metadatas
@@ -87,7 +383,8 @@ class VectorDatabase:
             logger.error(f"添加图片失败: {e}")
             raise
     
-    def search(self, query_embedding: List[float], top_k: int = 20, threshold: float = 0.0) -> List[Dict[str, Any]]:
+    def search(self, query_embedding: List[float], top_k: int = 20, threshold: float = 0.0,
+               model_name: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         搜索相似图片
         
@@ -95,20 +392,28 @@ class VectorDatabase:
             query_embedding: 查询向量
             top_k: 返回结果数量
             threshold: 相似度阈值 (0.0-1.0)
+            model_name: 生成查询向量的模型，只检索该模型的集合
             
         Returns:
             搜索结果列表，每项包含 path 和 score
         """
         try:
-            if self.collection.count() == 0:
-                logger.warning("数据库为空，请先索引图片")
-                return []
-            
-            # ChromaDB 查询
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=min(top_k, self.collection.count())
-            )
+            # 登记为读者: 切换集合后，旧集合要等本次查询结束才会被回收
+            with self._reading(model_name) as collection:
+                if collection is None:
+                    logger.warning(f"模型 {model_name} 没有对应的索引集合，请重建索引")
+                    return []
+                
+                count = collection.count()
+                if count == 0:
+                    logger.warning("数据库为空，请先索引图片")
+                    return []
+                
+                # ChromaDB 查询
+                results = collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=min(top_k, count)
+                )
             
             # 处理结果
             filtered_results = []
@@ -136,40 +441,49 @@ class VectorDatabase:
     def get_stats(self) -> Dict[str, Any]:
         """获取数据库统计信息"""
         try:
+            shadow = self.shadow
             return {
                 'total_images': self.collection.count(),
-                'collection_name': self.collection.name
+                'collection_name': self.collection.name,
+                'model_name': self.model_name,
+                'hnsw': self.get_hnsw_params(self.collection),
+                'shadow_collection': shadow.name if shadow else None,
+                'shadow_images': shadow.count() if shadow else 0
             }
         except Exception as e:
             logger.error(f"获取统计信息失败: {e}")
             return {'total_images': 0, 'collection_name': 'unknown'}
     
     def clear(self):
-        """清空数据库"""
+        """清空当前模型的集合 (需要保持搜索可用时请使用影子重建)"""
         try:
-            self.client.delete_collection("images")
-            self.collection = self.client.create_collection(
-                name="images",
-                metadata={"hnsw:space": "cosine"}
-            )
+            with self._lock:
+                old = self.collection
+                # 保留当前集合的 HNSW 参数
+                hnsw = {k: v for k, v in self.get_hnsw_params(old).items() if k in HNSW_KEYS}
+                self.collection = self._new_collection(self.model_name, hnsw=hnsw)
+                self.registry[self.model_name] = self.collection.name
+                self._save_registry()
+            self._drop_collection(old.name)
             logger.info("✅ 数据库已清空")
         except Exception as e:
             logger.error(f"清空数据库失败: {e}")
             raise
     
-    def check_image_exists(self, path: str) -> bool:
+    def check_image_exists(self, path: str, collection=None) -> bool:
         """
         检查图片是否已索引
         
         Args:
             path: 图片文件路径
+            collection: 目标集合，默认为当前服务集合
             
         Returns:
             True if exists, False otherwise
         """
         try:
             image_id = self._generate_image_id(path)
-            result = self.collection.get(ids=[image_id])
+            result = (collection if collection is not None else self.collection).get(ids=[image_id])
             exists = len(result['ids']) > 0
             
             if exists:
@@ -181,3 +495,30 @@ class VectorDatabase:
             logger.warning(f"检查图片存在性失败 {path}: {e}")
             # 保守策略: 出错时返回False，由add()去检测重复
             return False
+    
+    def existing_paths(self, paths: List[str], collection=None, chunk_size: int = 1000) -> set:
+        """
+        批量检查哪些图片已索引 (每 chunk_size 个路径一次查询)
+        
+        Args:
+            paths: 图片文件路径列表
+            collection: 目标集合，默认为当前服务集合
+            chunk_size: 每次查询的 ID 数
+            
+        Returns:
+            已索引的路径集合
+        """
+        target = collection if collection is not None else self.collection
+        existing = set()
+        
+        for start in range(0, len(paths), chunk_size):
+            chunk = paths[start:start + chunk_size]
+            ids = {self._generate_image_id(p): p for p in chunk}
+            try:
+                result = target.get(ids=list(ids), include=[])
+                existing.update(ids[i] for i in result['ids'])
+            except Exception as e:
+                # 保守策略: 出错时视为未索引，由add()去检测重复
+                logger.warning(f"批量检查图片存在性失败 ({len(chunk)} 张): {e}")
+        
+        return existing
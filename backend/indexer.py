@@ -7,33 +7,79 @@ from PIL import Image
 from pillow_heif import register_heif_opener
 import logging
 from pathlib import Path
-from typing import List, Callable, Optional
+from typing import List, Callable, Optional, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import gc
 
 from .config import (
     PHOTOS_DIR, SUPPORTED_FORMATS, 
-    BATCH_SIZE
+    NUM_WORKERS, DECODE_SHORT_SIDE
 )
+from .memory import MemoryGovernor
 
 # 注册 HEIC 格式支持
 register_heif_opener()
 
 logger = logging.getLogger(__name__)
 
+# resize 可直接处理的模式: 先缩放再转 RGB，避免 convert 先复制一份全尺寸位图
+RESIZE_MODES = {"RGB", "RGBA", "L", "LA", "CMYK"}
+
+
+def load_image(source, short_side: int = DECODE_SHORT_SIDE) -> Tuple[Image.Image, bool]:
+    """
+    读取图片并在完整解码前降采样
+    
+    JPEG 通过 draft 在 DCT 阶段按比例缩小解码，
+    其他格式 (PNG、HEIC 等) 解码后先缩放再转 RGB，使短边不超过 short_side
+    
+    Args:
+        source: 图片路径或文件对象
+        short_side: 短边上限
+        
+    Returns:
+        (RGB 模式的 PIL Image, 是否进行了降采样)
+    """
+    with Image.open(source) as image:
+        width, height = image.size
+        scale = short_side / min(width, height)
+        
+        if scale < 1:
+            target = (max(1, round(width * scale)), max(1, round(height * scale)))
+            image.draft("RGB", target)
+            result = image if image.mode in RESIZE_MODES else image.convert("RGB")
+            if result.size != target:
+                result = result.resize(target, Image.BICUBIC)
+            return result.convert("RGB"), True
+        
+        return image.convert("RGB"), False
+
+
+def build_metadata(photo_path: Path) -> dict:
+    """构建图片元数据"""
+    return {
+        'path': str(photo_path),
+        'filename': photo_path.name,
+        'vlm_analyzed': False # V1.0 标记
+    }
+
 
 class ImageIndexer:
     """图片索引器 - V1.0"""
     
-    def __init__(self, model_manager, vector_db):
+    def __init__(self, model_manager, vector_db, governor: Optional[MemoryGovernor] = None):
         """
         初始化索引器 - V1.0
         
         Args:
             model_manager: CLIPModelManager 实例
             vector_db: VectorDatabase 实例
+            governor: MemoryGovernor 实例 (默认使用配置中的 RSS 预算)
         """
         self.model = model_manager
         self.db = vector_db
+        self.governor = governor or MemoryGovernor()
         self.logger = logging.getLogger(__name__)
         self.logger.info("📌 V1.0 模式：仅使用 Chinese-CLIP 进行视觉索引")
     
@@ -52,8 +98,20 @@ class ImageIndexer:
         self.logger.info(f"✅ 找到 {len(photos)} 张图片")
         return photos
     
-    def index_all(self, progress_callback: Optional[Callable[[int, int], None]] = None) -> dict:
-        """索引所有图片"""
+    def index_all(self, progress_callback: Optional[Callable[[int, int], None]] = None,
+                  collection=None,
+                  failure_callback: Optional[Callable[[str, str], None]] = None) -> dict:
+        """
+        索引所有图片
+        
+        图片在线程池中预解码，经内存调控器约束批次、队列大小和解码尺寸，
+        内存超过硬阈值时暂停读入新图片
+        
+        Args:
+            progress_callback: 进度回调 (current, total)
+            collection: 写入的集合，默认为当前服务集合
+            failure_callback: 失败回调 (path, error)
+        """
         photos = self.scan_photos()
         total = len(photos)
         
@@ -63,33 +121,79 @@ class ImageIndexer:
         success_count = 0
         failed_count = 0
         skipped_count = 0
+        processed = 0
+        next_index = 0
+        queue = deque()
         
+        self.governor.reset()
         self.logger.info(f"开始索引 {total} 张图片...")
         
-        for i, photo_path in enumerate(photos):
-            try:
-                # 检查是否已索引
-                if self.db.check_image_exists(str(photo_path)):
-                    skipped_count += 1
-                    if progress_callback: progress_callback(i + 1, total)
+        with ThreadPoolExecutor(max_workers=NUM_WORKERS) as pool:
+            while next_index < total or queue:
+                self.governor.check()
+                
+                # 队列为空且内存超限: 暂停读入直到回落
+                if not queue and self.governor.should_pause():
+                    self.governor.wait_for_memory()
+                
+                # 读入新图片 (队列为空时至少读入一张，保证推进)
+                while next_index < total and len(queue) < self.governor.queue_size():
+                    if queue and self.governor.should_pause():
+                        break
+                    
+                    photo_path = photos[next_index]
+                    next_index += 1
+                    
+                    # 检查是否已索引
+                    if self.db.check_image_exists(str(photo_path), collection=collection):
+                        skipped_count += 1
+                        processed += 1
+                        if progress_callback: progress_callback(processed, total)
+                        continue
+                    
+                    short_side = self.governor.decode_short_side()
+                    queue.append((photo_path, pool.submit(self._load_image, photo_path, short_side)))
+                
+                if not queue:
                     continue
                 
-                # 索引单张图片
-                if self._index_single_internal(photo_path):
-                    success_count += 1
-                    if (i+1) % 10 == 0:
-                        self.logger.info(f"进度: {i+1}/{total}")
-                else:
-                    failed_count += 1
+                # 取出一个批次进行编码
+                batch = [queue.popleft() for _ in range(min(self.governor.batch_size(), len(queue)))]
+                loaded = []
+                
+                for photo_path, future in batch:
+                    try:
+                        loaded.append((photo_path, future.result()))
+                    except Exception as e:
+                        failed_count += 1
+                        self.logger.warning(f"处理失败 {photo_path.name}: {e}")
+                        if failure_callback: failure_callback(str(photo_path), f"解码失败: {e}")
+                
+                if loaded:
+                    if self._index_batch_internal(loaded, collection=collection):
+                        success_count += len(loaded)
+                    elif len(loaded) == 1:
+                        failed_count += 1
+                        if failure_callback: failure_callback(str(loaded[0][0]), "编码或写入失败")
+                    else:
+                        # 批次失败时逐张重试，只报告真正出错的图片
+                        self.logger.info(f"批次失败，逐张重试 {len(loaded)} 张图片")
+                        for item in loaded:
+                            if self._index_batch_internal([item], collection=collection):
+                                success_count += 1
+                            else:
+                                failed_count += 1
+                                if failure_callback: failure_callback(str(item[0]), "编码或写入失败")
                 
-            except Exception as e:
-                failed_count += 1
-                self.logger.warning(f"处理失败 {photo_path.name}: {e}")
+                previous = processed
+                processed += len(batch)
+                del batch, loaded
                 
-            finally:
-                if progress_callback: progress_callback(i + 1, total)
+                if progress_callback: progress_callback(processed, total)
+                if processed // 10 > previous // 10:
+                    self.logger.info(f"进度: {processed}/{total}")
                 # 定期清理内存
-                if (i + 1) % 50 == 0:
+                if processed // 50 > previous // 50:
                     gc.collect()
         
         return {
@@ -99,29 +203,76 @@ class ImageIndexer:
             'skipped': skipped_count
         }
     
-    def _index_single_internal(self, photo_path: Path) -> bool:
-        """索引单张图片 (CLIP 向量化)"""
+    def rebuild_all(self, progress_callback: Optional[Callable[[int, int], None]] = None,
+                    failure_callback: Optional[Callable[[str, str], None]] = None,
+                    hnsw: Optional[dict] = None) -> dict:
+        """
+        影子重建: 在新集合中完整索引，旧集合在此期间继续提供搜索，
+        完成后原子切换并回收旧集合
+        
+        Args:
+            progress_callback: 进度回调 (current, total)
+            failure_callback: 失败回调 (path, error)
+            hnsw: 新集合的 HNSW 参数覆盖
+        """
+        shadow = self.db.begin_shadow(hnsw=hnsw)
         try:
-            image = Image.open(photo_path).convert("RGB")
+            result = self.index_all(
+                progress_callback=progress_callback,
+                collection=shadow,
+                failure_callback=failure_callback
+            )
+        except Exception:
+            self.db.abort_shadow()
+            raise
+        
+        reason = self.db.validate_shadow(result)
+        if reason:
+            self.db.abort_shadow()
+            raise RuntimeError(f"重建结果异常，保留当前索引: {reason}")
+        
+        self.db.commit_shadow()
+        return result
+    
+    def _load_image(self, photo_path: Path, short_side: int = DECODE_SHORT_SIDE) -> Image.Image:
+        """读取图片并在完整解码前降采样 (见 load_image)"""
+        # 内存紧张时限制同时解码的图片数
+        with self.governor.decode_slot():
+            image, downsampled = load_image(photo_path, short_side)
+        if downsampled:
+            self.governor.record_downsample()
+        return image
+    
+    def _index_batch_internal(self, loaded: List[Tuple[Path, Image.Image]], collection=None) -> bool:
+        """批量索引已解码的图片 (CLIP 向量化)"""
+        try:
+            paths = [str(photo_path) for photo_path, _ in loaded]
             
             # 视觉编码
-            visual_embedding = self.model.encode_image(image)
+            visual_embeddings = self.model.encode_images([image for _, image in loaded])
             
             # 构建元数据
-            metadata = {
-                'path': str(photo_path),
-                'filename': photo_path.name,
-                'vlm_analyzed': False # V1.0 标记
-            }
+            metadatas = [build_metadata(photo_path) for photo_path, _ in loaded]
             
             # 存入数据库
             self.db.add_images(
-                paths=[str(photo_path)],
-                embeddings=[visual_embedding.tolist()],
-                metadatas=[metadata]
+                paths=paths,
+                embeddings=visual_embeddings.tolist(),
+                metadatas=metadatas,
+                collection=collection
             )
             return True
             
+        except Exception as e:
+            self.logger.error(f"批量索引失败 ({len(loaded)} 张): {e}")
+            return False
+    
+    def _index_single_internal(self, photo_path: Path) -> bool:
+        """索引单张图片 (CLIP 向量化)"""
+        try:
+            image = self._load_image(photo_path)
+            return self._index_batch_internal([(photo_path, image)])
+            
         except Exception as e:
             self.logger.error(f"索引失败 {photo_path}: {e}")
             return False
@@ -8,19 +8,28 @@ V1.0 特性:
 - CPU 优化,低配设备友好
 """
 
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
+import asyncio
+import json
 import logging
+import time
 from pathlib import Path
 
 from .models import CLIPModelManager
 from .database import VectorDatabase
 from .indexer import ImageIndexer
-from .searcher import ImageSearcher
-from .config import FRONTEND_DIR, PHOTOS_DIR
+from .searcher import ImageSearcher, InvalidCursorError
+from .progress import ProgressTracker
+from .workqueue import WorkQueue
+from .coordinator import IndexCoordinator
+from .config import (
+    FRONTEND_DIR, PHOTOS_DIR, SSE_INTERVAL, SSE_KEEPALIVE, SSE_STATS_INTERVAL,
+    WORK_QUEUE_PATH, WORK_UNIT_SIZE, WORK_LEASE_SECONDS, WORK_MAX_ATTEMPTS
+)
 
 # 配置日志
 logging.basicConfig(
@@ -46,13 +55,17 @@ try:
     logger.info("✅ Chinese-CLIP 模型已加载")
     
     # 初始化向量数据库
-    vector_db = VectorDatabase()
+    vector_db = VectorDatabase(model_name=model_manager.get_info()["model_name"])
     logger.info("✅ 向量数据库已初始化")
     
     # 初始化索引器和搜索器
     indexer = ImageIndexer(model_manager, vector_db)
     searcher = ImageSearcher(model_manager, vector_db)
     
+    # 初始化分布式索引协调器
+    work_queue = WorkQueue(WORK_QUEUE_PATH, lease_seconds=WORK_LEASE_SECONDS, max_attempts=WORK_MAX_ATTEMPTS)
+    coordinator = IndexCoordinator(indexer, vector_db, work_queue)
+    
     logger.info("✅ MemoryHunter V1.0 初始化完成!")
     logger.info("📌 V1.0 模式: 仅使用 Chinese-CLIP 视觉搜索")
     
@@ -61,20 +74,55 @@ except Exception as e:
     raise
 
 # ============ 全局状态管理 ============
+progress_tracker = ProgressTracker()
+
 indexing_status = {
     "is_indexing": False,
-    "progress": 0,
-    "total": 0,
-    "message": "就绪"
+    "message": "就绪",
+    **progress_tracker.snapshot(),
+    "memory": indexer.governor.get_status(),
+    "distributed": coordinator.get_status()
 }
 
 
+def _on_distributed_progress(current, total):
+    """分布式任务进度回调"""
+    progress_tracker.update(current, total)
+    indexing_status.update(progress_tracker.snapshot())
+    indexing_status["distributed"] = coordinator.get_status()
+
+
+def _on_distributed_done(result):
+    """分布式任务结束回调"""
+    indexing_status.update(progress_tracker.snapshot())
+    indexing_status["is_indexing"] = False
+    indexing_status["distributed"] = coordinator.get_status()
+    if result.get('aborted'):
+        indexing_status["message"] = f"重建结果异常，保留当前索引: {result['aborted']}"
+    else:
+        indexing_status["message"] = f"分布式索引完成! 成功: {result['success']}, 失败: {result['failed']}"
+
+
+coordinator.set_callbacks(
+    progress_callback=_on_distributed_progress,
+    failure_callback=progress_tracker.record_failure,
+    done_callback=_on_distributed_done
+)
+
+if coordinator.is_active:
+    # 恢复上次未完成的分布式任务
+    indexing_status["is_indexing"] = True
+    indexing_status["message"] = "正在分布式索引..."
+    indexing_status["distributed"] = coordinator.get_status()
+
+
 # ============ Pydantic 模型 ============
 class SearchRequest(BaseModel):
     """搜索请求"""
     query: str = Field(..., description="中文搜索查询", min_length=1)
-    top_k: int = Field(20, description="返回结果数量", ge=1, le=100)
+    top_k: int = Field(20, description="每页结果数量", ge=1, le=100)
     threshold: float = Field(0.0, description="相似度阈值", ge=0.0, le=1.0)
+    cursor: Optional[str] = Field(None, description="上一页返回的游标，为空时发起新搜索")
 
 
 class SearchResponse(BaseModel):
@@ -82,6 +130,54 @@ class SearchResponse(BaseModel):
     query: str
     results: List[Dict[str, Any]]
     count: int
+    total: int = Field(0, description="候选结果总数")
+    next_cursor: Optional[str] = Field(None, description="下一页游标，没有更多结果时为空")
+
+
+class HnswParams(BaseModel):
+    """HNSW 索引参数 (未指定的项使用配置默认值)"""
+    M: Optional[int] = Field(None, description="每个节点的邻居数", ge=2, le=128)
+    construction_ef: Optional[int] = Field(None, description="建图候选集大小", ge=1, le=2000)
+    search_ef: Optional[int] = Field(None, description="查询候选集大小", ge=1, le=2000)
+
+
+class RebuildRequest(BaseModel):
+    """重建请求"""
+    hnsw: Optional[HnswParams] = Field(None, description="新集合的 HNSW 参数")
+
+
+class DistributedIndexRequest(BaseModel):
+    """分布式索引请求"""
+    rebuild: bool = Field(False, description="是否在影子集合中完整重建")
+    unit_size: int = Field(WORK_UNIT_SIZE, description="每个工作单元的图片数", ge=1, le=1000)
+    hnsw: Optional[HnswParams] = Field(None, description="重建时新集合的 HNSW 参数")
+
+
+class LeaseRequest(BaseModel):
+    """worker 领取工作单元请求"""
+    worker_id: str = Field(..., description="worker 标识", min_length=1)
+    model_name: str = Field(..., description="worker 加载的模型")
+
+
+class WorkerEmbedding(BaseModel):
+    """worker 回传的单张图片向量"""
+    path: str
+    embedding: List[float]
+
+
+class WorkerFailure(BaseModel):
+    """worker 处理失败的图片"""
+    path: str
+    error: str
+
+
+class CompleteRequest(BaseModel):
+    """worker 提交工作单元结果请求"""
+    worker_id: str = Field(..., description="worker 标识", min_length=1)
+    model_name: str = Field(..., description="worker 加载的模型")
+    unit_id: int
+    results: List[WorkerEmbedding] = []
+    failures: List[WorkerFailure] = []
 
 
 class IndexResponse(BaseModel):
@@ -105,33 +201,56 @@ async def root():
     return FileResponse(str(FRONTEND_DIR / "index.html"))
 
 
-@app.post("/api/index", response_model=IndexResponse)
-async def trigger_index(background_tasks: BackgroundTasks):
+def _start_index_task(background_tasks: BackgroundTasks, rebuild: bool = False,
+                      hnsw: Optional[Dict[str, int]] = None):
     """
-    触发图片索引
-    后台异步执行，立即返回
+    启动后台索引任务
+    
+    Args:
+        background_tasks: FastAPI 后台任务
+        rebuild: True 时在影子集合中完整重建，完成后原子切换
+        hnsw: 重建时新集合的 HNSW 参数
     """
     global indexing_status
     
     if indexing_status["is_indexing"]:
         raise HTTPException(status_code=409, detail="索引正在进行中，请稍后再试")
     
+    # 立即标记，避免并发请求重复启动
+    progress_tracker.start()
+    indexing_status.update(progress_tracker.snapshot())
+    indexing_status["is_indexing"] = True
+    indexing_status["message"] = "正在重建索引..." if rebuild else "正在索引..."
+    
     def index_task():
         """后台索引任务"""
         global indexing_status
         
         try:
-            indexing_status["is_indexing"] = True
-            indexing_status["message"] = "正在索引..."
-            
             def progress_callback(current, total):
-                indexing_status["progress"] = current
-                indexing_status["total"] = total
+                progress_tracker.update(current, total)
+                indexing_status.update(progress_tracker.snapshot())
+                indexing_status["memory"] = indexer.governor.get_status()
+            
+            def failure_callback(path, error):
+                progress_tracker.record_failure(path, error)
             
             # 执行索引
-            result = indexer.index_all(progress_callback=progress_callback)
+            if rebuild:
+                result = indexer.rebuild_all(
+                    progress_callback=progress_callback,
+                    failure_callback=failure_callback,
+                    hnsw=hnsw
+                )
+            else:
+                result = indexer.index_all(
+                    progress_callback=progress_callback,
+                    failure_callback=failure_callback
+                )
             
+            indexing_status.update(progress_tracker.snapshot())
             indexing_status["is_indexing"] = False
+            indexing_status["memory"] = indexer.governor.get_status()
             indexing_status["message"] = f"索引完成! 成功: {result['success']}, 失败: {result['failed']}"
             
         except Exception as e:
@@ -141,6 +260,15 @@ async def trigger_index(background_tasks: BackgroundTasks):
     
     # 添加到后台任务
     background_tasks.add_task(index_task)
+
+
+@app.post("/api/index", response_model=IndexResponse)
+async def trigger_index(background_tasks: BackgroundTasks):
+    """
+    触发图片索引
+    后台异步执行，立即返回
+    """
+    _start_index_task(background_tasks)
     
     return IndexResponse(
         status="started",
@@ -148,36 +276,180 @@ async def trigger_index(background_tasks: BackgroundTasks):
     )
 
 
+@app.post("/api/index/rebuild", response_model=IndexResponse)
+async def trigger_rebuild(background_tasks: BackgroundTasks, request: Optional[RebuildRequest] = None):
+    """
+    触发影子重建
+    在新集合中完整重建索引，期间旧集合继续提供搜索，完成后原子切换；
+    可同时为新集合指定 HNSW 参数
+    """
+    hnsw = request.hnsw.dict(exclude_none=True) if request and request.hnsw else None
+    _start_index_task(background_tasks, rebuild=True, hnsw=hnsw)
+    
+    return IndexResponse(
+        status="started",
+        message="重建任务已启动，完成前搜索继续使用当前索引"
+    )
+
+
+@app.post("/api/index/distributed", response_model=IndexResponse)
+def trigger_distributed_index(request: DistributedIndexRequest):
+    """
+    触发分布式索引
+    扫描相册并切分为工作单元，由 worker (python -m backend.worker) 领取处理
+    """
+    global indexing_status
+    
+    if indexing_status["is_indexing"]:
+        raise HTTPException(status_code=409, detail="索引正在进行中，请稍后再试")
+    
+    progress_tracker.start()
+    indexing_status.update(progress_tracker.snapshot())
+    indexing_status["is_indexing"] = True
+    indexing_status["message"] = "正在分布式索引..."
+    
+    try:
+        status = coordinator.start_job(
+            rebuild=request.rebuild,
+            unit_size=request.unit_size,
+            hnsw=request.hnsw.dict(exclude_none=True) if request.hnsw else None
+        )
+    except Exception as e:
+        logger.error(f"启动分布式索引失败: {e}")
+        indexing_status["is_indexing"] = False
+        indexing_status["message"] = f"索引失败: {str(e)}"
+        raise HTTPException(status_code=500, detail=f"启动分布式索引失败: {str(e)}")
+    
+    indexing_status["distributed"] = coordinator.get_status()
+    
+    return IndexResponse(
+        status="started",
+        message=f"分布式索引任务已创建，共 {status.get('units', {}).get('units', 0)} 个工作单元"
+    )
+
+
+@app.delete("/api/index/distributed")
+def cancel_distributed_index():
+    """取消分布式索引任务"""
+    if not coordinator.is_active:
+        raise HTTPException(status_code=404, detail="没有正在进行的分布式索引任务")
+    
+    coordinator.cancel()
+    indexing_status["is_indexing"] = False
+    indexing_status["distributed"] = coordinator.get_status()
+    indexing_status["message"] = "分布式索引已取消"
+    return {"status": "success", "message": "分布式索引已取消"}
+
+
+@app.post("/api/workers/lease")
+def lease_work_unit(request: LeaseRequest):
+    """worker 领取工作单元，当前没有可分配单元时 unit 为 null"""
+    try:
+        unit = coordinator.lease(request.worker_id, request.model_name)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return {"unit": unit, "job_active": coordinator.is_active}
+
+
+@app.post("/api/workers/complete")
+def complete_work_unit(request: CompleteRequest):
+    """worker 提交工作单元的向量结果"""
+    try:
+        accepted = coordinator.complete(
+            worker_id=request.worker_id,
+            model_name=request.model_name,
+            unit_id=request.unit_id,
+            results=[r.dict() for r in request.results],
+            failures=[f.dict() for f in request.failures]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if not accepted:
+        raise HTTPException(status_code=409, detail="租约已失效，结果已丢弃")
+    
+    return {"status": "success"}
+
+
 @app.get("/api/index/status")
 async def get_index_status():
     """获取索引状态"""
     return indexing_status
 
 
+@app.get("/api/index/events")
+async def stream_index_events(request: Request):
+    """
+    索引进度推送 (Server-Sent Events)
+    
+    每 SSE_INTERVAL 秒最多推送一次，只在状态变化时发送 progress 事件，
+    空闲时发送注释行保持连接；事件附带图片总数 (索引期间每 SSE_STATS_INTERVAL 秒刷新一次)
+    """
+    async def event_stream():
+        last_payload = None
+        last_sent = 0.0
+        total_images = None
+        stats_at = 0.0
+        was_indexing = None
+        
+        while not await request.is_disconnected():
+            now = time.monotonic()
+            is_indexing = indexing_status["is_indexing"]
+            if (total_images is None or is_indexing != was_indexing
+                    or (is_indexing and now - stats_at >= SSE_STATS_INTERVAL)):
+                total_images = vector_db.get_stats()["total_images"]
+                stats_at = now
+                was_indexing = is_indexing
+            
+            payload = json.dumps({**indexing_status, "total_images": total_images}, ensure_ascii=False)
+            
+            if payload != last_payload:
+                yield f"event: progress\ndata: {payload}\n\n"
+                last_payload = payload
+                last_sent = now
+            elif now - last_sent >= SSE_KEEPALIVE:
+                yield ": keepalive\n\n"
+                last_sent = now
+            
+            await asyncio.sleep(SSE_INTERVAL)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/api/search", response_model=SearchResponse)
 async def search_images(request: SearchRequest):
     """
-    搜索图片
+    搜索图片 (支持游标分页)
     
     Args:
-        request: 搜索请求
+        request: 搜索请求，携带 cursor 时从缓存的候选列表返回下一页
         
     Returns:
-        搜索结果
+        搜索结果及下一页游标
     """
     try:
-        results = searcher.search(
+        page = searcher.search_page(
             query_text=request.query,
-            top_k=request.top_k,
-            threshold=request.threshold
+            page_size=request.top_k,
+            threshold=request.threshold,
+            cursor=request.cursor
         )
         
         return SearchResponse(
             query=request.query,
-            results=results,
-            count=len(results)
+            results=page['results'],
+            count=len(page['results']),
+            total=page['total'],
+            next_cursor=page['next_cursor']
         )
         
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=410, detail=str(e))
     except Exception as e:
         logger.error(f"搜索失败: {e}")
         raise HTTPException(status_code=500, detail=f"搜索失败: {str(e)}")
@@ -0,0 +1,256 @@
+"""
+内存调控器
+在 RSS 预算内运行索引流水线: 压力下缩小批次与队列、降低解码尺寸，
+超过硬阈值时暂停读入新图片直到内存回落
+"""
+
+import gc
+import logging
+import os
+import resource
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any
+
+from .config import (
+    MEMORY_BUDGET_MB, MEMORY_SOFT_RATIO, MEMORY_HARD_RATIO,
+    MEMORY_PAUSE_TIMEOUT, MEMORY_PAUSE_REARM_RATIO, BATCH_SIZE, INDEX_QUEUE_SIZE, NUM_WORKERS,
+    DECODE_SHORT_SIDE, DECODE_SHORT_SIDE_MIN
+)
+
+logger = logging.getLogger(__name__)
+
+STATE_NORMAL = "normal"
+STATE_PRESSURE = "pressure"
+STATE_CRITICAL = "critical"
+
+
+def current_rss_mb() -> float:
+    """
+    读取当前进程的常驻内存 (MB)
+
+    优先读取 /proc/self/statm (Linux/Docker)，
+    其他平台退化为 getrusage 的峰值 RSS
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 以字节为单位，Linux 以 KB 为单位
+        divisor = 1024 * 1024 if os.uname().sysname == "Darwin" else 1024
+        return peak / divisor
+
+
+class MemoryGovernor:
+    """索引内存调控器"""
+
+    def __init__(self, budget_mb: float = MEMORY_BUDGET_MB,
+                 soft_ratio: float = MEMORY_SOFT_RATIO,
+                 hard_ratio: float = MEMORY_HARD_RATIO,
+                 max_batch: int = BATCH_SIZE,
+                 max_queue: int = INDEX_QUEUE_SIZE,
+                 max_decoders: int = NUM_WORKERS):
+        """
+        初始化调控器
+
+        Args:
+            budget_mb: RSS 预算 (MB)
+            soft_ratio: 软阈值比例，超过后缩小批次和队列
+            hard_ratio: 硬阈值比例，超过后暂停读入
+            max_batch: 正常状态下的批次大小
+            max_queue: 正常状态下的预解码队列大小
+            max_decoders: 正常状态下同时解码的图片数
+        """
+        self.budget_mb = budget_mb
+        self.soft_mb = budget_mb * soft_ratio
+        self.hard_mb = budget_mb * hard_ratio
+        self.max_batch = max(1, max_batch)
+        self.max_queue = max(self.max_batch, max_queue)
+        self.max_decoders = max(1, max_decoders)
+        self.rearm_mb = budget_mb * MEMORY_PAUSE_REARM_RATIO
+
+        self._lock = threading.Lock()
+        self.state = STATE_NORMAL
+        self.rss_mb = 0.0
+        self.peak_rss_mb = 0.0
+        self.pauses = 0
+        self.paused_seconds = 0.0
+        self.downsampled = 0
+        self.decisions = deque(maxlen=10)
+        # 上次暂停超时时的 RSS: 在回落到软阈值以下或继续增长 rearm_mb 之前不再暂停
+        self.timed_out_rss_mb = None
+
+        # 解码并发: 正在解码的图片数，状态变化时唤醒等待的解码线程
+        self._decoding = 0
+        self._decode_slots = threading.Condition()
+
+    def reset(self):
+        """开始新一轮索引前重置统计"""
+        with self._lock:
+            self.state = STATE_NORMAL
+            self.peak_rss_mb = 0.0
+            self.pauses = 0
+            self.paused_seconds = 0.0
+            self.downsampled = 0
+            self.decisions.clear()
+            self.timed_out_rss_mb = None
+
+    def check(self) -> str:
+        """采样 RSS 并更新调控状态"""
+        rss = current_rss_mb()
+
+        if rss >= self.hard_mb:
+            state = STATE_CRITICAL
+        elif rss >= self.soft_mb:
+            state = STATE_PRESSURE
+        else:
+            state = STATE_NORMAL
+
+        with self._lock:
+            self.rss_mb = rss
+            self.peak_rss_mb = max(self.peak_rss_mb, rss)
+            previous = self.state
+            self.state = state
+            rearmed = self.timed_out_rss_mb is not None and rss < self.soft_mb
+            if rearmed:
+                self.timed_out_rss_mb = None
+
+        if rearmed:
+            self._record("RSS 回落到软阈值以下，恢复暂停机制")
+
+        if state != previous:
+            self._record(f"{previous} -> {state} (RSS {rss:.0f}MB / 预算 {self.budget_mb:.0f}MB)")
+            with self._decode_slots:
+                self._decode_slots.notify_all()
+            if state != STATE_NORMAL:
+                gc.collect()
+
+        return state
+
+    def should_pause(self) -> bool:
+        """
+        是否应暂停读入新图片
+
+        上次暂停超时后，只有 RSS 先回落到软阈值以下 (由 check 重新启用)，
+        或比超时时再增长 rearm_mb 时才再次暂停，避免每张图片都等满一次超时
+        """
+        if self.state != STATE_CRITICAL:
+            return False
+        timed_out = self.timed_out_rss_mb
+        return timed_out is None or self.rss_mb >= timed_out + self.rearm_mb
+
+    def batch_size(self) -> int:
+        """当前允许的编码批次大小"""
+        if self.state == STATE_CRITICAL:
+            return 1
+        if self.state == STATE_PRESSURE:
+            return max(1, self.max_batch // 2)
+        return self.max_batch
+
+    def queue_size(self) -> int:
+        """当前允许的预解码队列大小"""
+        if self.state == STATE_CRITICAL:
+            return 1
+        if self.state == STATE_PRESSURE:
+            return self.batch_size()
+        return self.max_queue
+
+    def decode_workers(self) -> int:
+        """当前允许同时解码的图片数"""
+        if self.state == STATE_CRITICAL:
+            return 1
+        if self.state == STATE_PRESSURE:
+            return max(1, self.max_decoders // 2)
+        return self.max_decoders
+
+    @contextmanager
+    def decode_slot(self):
+        """占用一个解码名额，超出 decode_workers 时等待"""
+        with self._decode_slots:
+            self._decode_slots.wait_for(lambda: self._decoding < self.decode_workers())
+            self._decoding += 1
+        try:
+            yield
+        finally:
+            with self._decode_slots:
+                self._decoding -= 1
+                self._decode_slots.notify_all()
+
+    def decode_short_side(self) -> int:
+        """当前解码时的短边上限"""
+        if self.state == STATE_NORMAL:
+            return DECODE_SHORT_SIDE
+        return DECODE_SHORT_SIDE_MIN
+
+    def record_downsample(self):
+        """记录一次解码前降采样"""
+        with self._lock:
+            self.downsampled += 1
+
+    def wait_for_memory(self, timeout: float = MEMORY_PAUSE_TIMEOUT) -> bool:
+        """
+        暂停直到 RSS 回落到软阈值以下
+
+        Args:
+            timeout: 最长等待秒数，超时后放行以保证索引能继续推进
+
+        Returns:
+            True 表示内存已回落，False 表示等待超时
+        """
+        self.check()
+        if not self.should_pause():
+            return True
+
+        self._record(f"暂停读入 (RSS {self.rss_mb:.0f}MB)")
+        start = time.monotonic()
+        recovered = False
+
+        while time.monotonic() - start < timeout:
+            gc.collect()
+            time.sleep(0.5)
+            if current_rss_mb() < self.soft_mb:
+                recovered = True
+                break
+
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self.pauses += 1
+            self.paused_seconds += elapsed
+            self.timed_out_rss_mb = None if recovered else current_rss_mb()
+
+        self.check()
+        if recovered:
+            self._record(f"恢复读入，暂停 {elapsed:.1f}s")
+        else:
+            logger.warning(f"⚠️ 内存未能在 {timeout:.0f}s 内回落，以最小批次继续")
+            self._record(f"暂停超时 {elapsed:.1f}s，以最小批次继续")
+        return recovered
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取调控状态 (用于索引状态接口)"""
+        with self._lock:
+            return {
+                "state": self.state,
+                "rss_mb": round(self.rss_mb, 1),
+                "peak_rss_mb": round(self.peak_rss_mb, 1),
+                "budget_mb": self.budget_mb,
+                "batch_size": self.batch_size(),
+                "queue_size": self.queue_size(),
+                "decode_workers": self.decode_workers(),
+                "decode_short_side": self.decode_short_side(),
+                "pauses": self.pauses,
+                "paused_seconds": round(self.paused_seconds, 1),
+                "downsampled": self.downsampled,
+                "pause_suppressed": self.timed_out_rss_mb is not None,
+                "recent_decisions": list(self.decisions)
+            }
+
+    def _record(self, decision: str):
+        """记录调控决策"""
+        logger.info(f"🧠 内存调控: {decision}")
+        with self._lock:
+            self.decisions.append({"time": time.time(), "decision": decision})
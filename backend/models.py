@@ -6,7 +6,8 @@ Chinese-CLIP 模型管理器
 import torch
 from transformers import ChineseCLIPModel, ChineseCLIPProcessor
 import logging
-from .config import MODEL_NAME, DEVICE
+from .config import MODEL_NAME, DEVICE, BATCH_SIZE, FAST_PREPROCESS, PREPROCESS_TOLERANCE
+from .preprocess import BatchImagePreprocessor, verify_preprocessor
 
 logger = logging.getLogger(__name__)
 
@@ -44,12 +45,26 @@ class CLIPModelManager:
             self.model.to(DEVICE)
             self.model.eval()  # 设置为评估模式
             
+            # 批量预处理 (校验不通过时退回处理器)
+            self.preprocessor = None
+            if FAST_PREPROCESS:
+                self._init_preprocessor()
+            
             logger.info("✅ 模型加载成功!")
             
         except Exception as e:
             logger.error(f"❌ 模型加载失败: {e}")
             raise
     
+    def _init_preprocessor(self):
+        """初始化批量预处理器，与处理器输出不一致时不启用"""
+        try:
+            preprocessor = BatchImagePreprocessor(self.processor.image_processor, max_batch=BATCH_SIZE)
+            if verify_preprocessor(preprocessor, self.processor, PREPROCESS_TOLERANCE):
+                self.preprocessor = preprocessor
+        except Exception as e:
+            logger.warning(f"批量预处理不可用，使用处理器: {e}")
+    
     @torch.no_grad()
     def encode_image(self, image):
         """
@@ -61,16 +76,34 @@ class CLIPModelManager:
         Returns:
             numpy.ndarray: 图片特征向量
         """
-        try:
-            inputs = self.processor(images=image, return_tensors="pt")
-            inputs = {k: v.to(DEVICE) for k, v in inputs.items()}
+        return self.encode_images([image])[0]
+    
+    @torch.no_grad()
+    def encode_images(self, images):
+        """
+        批量编码图片为特征向量
+        
+        Args:
+            images: PIL Image 对象列表
             
-            features = self.model.get_image_features(**inputs)
+        Returns:
+            numpy.ndarray: 图片特征矩阵 (N, D)
+        """
+        try:
+            if self.preprocessor is not None:
+                # 预处理结果是复用缓冲区的视图，需在锁内完成前向计算
+                with self.preprocessor.lock:
+                    pixel_values = self.preprocessor(images).to(DEVICE)
+                    features = self.model.get_image_features(pixel_values=pixel_values)
+            else:
+                inputs = self.processor(images=images, return_tensors="pt")
+                inputs = {k: v.to(DEVICE) for k, v in inputs.items()}
+                features = self.model.get_image_features(**inputs)
             
             # 归一化
             features = features / features.norm(dim=-1, keepdim=True)
             
-            return features.cpu().numpy()[0]
+            return features.cpu().numpy()
             
         except Exception as e:
             logger.error(f"图片编码失败: {e}")
@@ -107,5 +140,7 @@ class CLIPModelManager:
         return {
             "model_name": MODEL_NAME,
             "device": DEVICE,
+            "embedding_dim": self.model.config.projection_dim,
+            "fast_preprocess": self.preprocessor is not None,
             "loaded": self._initialized
         }
@@ -0,0 +1,168 @@
+"""
+批量图片预处理
+替代 ChineseCLIPProcessor 的逐图 Python 预处理: PIL 直接缩放到模型输入尺寸，
+整批在预分配、可复用的张量中完成归一化
+"""
+
+import logging
+import threading
+from typing import List, Tuple
+
+import numpy as np
+import torch
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class BatchImagePreprocessor:
+    """
+    批量图片预处理器
+
+    从 ChineseCLIPImageProcessor 读取缩放、裁剪和归一化参数，
+    输出与其 pixel_values 数值一致 (误差在浮点舍入范围内)
+    """
+
+    def __init__(self, image_processor, max_batch: int = 8):
+        """
+        初始化预处理器
+
+        Args:
+            image_processor: ChineseCLIPImageProcessor 实例
+            max_batch: 预分配的批次容量，超出时自动扩容
+        """
+        ip = image_processor
+        self.do_resize = ip.do_resize
+        self.size = dict(ip.size)
+        self.resample = ip.resample
+        self.do_center_crop = ip.do_center_crop
+        self.crop_size = dict(ip.crop_size) if ip.crop_size else None
+        self.do_convert_rgb = getattr(ip, "do_convert_rgb", True)
+
+        if self.do_center_crop:
+            self.height, self.width = self.crop_size["height"], self.crop_size["width"]
+        elif self.do_resize and "height" in self.size:
+            self.height, self.width = self.size["height"], self.size["width"]
+        else:
+            raise ValueError(f"不支持的预处理配置 (输出尺寸不固定): size={self.size}, crop={self.crop_size}")
+
+        # (x * rescale - mean) / std  ==  x * scale - shift
+        rescale = ip.rescale_factor if ip.do_rescale else 1.0
+        mean = np.asarray(ip.image_mean if ip.do_normalize else [0.0, 0.0, 0.0], dtype=np.float64)
+        std = np.asarray(ip.image_std if ip.do_normalize else [1.0, 1.0, 1.0], dtype=np.float64)
+        self._scale = torch.tensor(rescale / std, dtype=torch.float32).view(1, 3, 1, 1)
+        self._shift = torch.tensor(mean / std, dtype=torch.float32).view(1, 3, 1, 1)
+
+        self._lock = threading.Lock()
+        self._allocate(max_batch)
+
+    def _allocate(self, capacity: int):
+        """分配 uint8 暂存区和输出张量"""
+        self.capacity = capacity
+        self._pixels = np.empty((capacity, self.height, self.width, 3), dtype=np.uint8)
+        self._output = torch.empty((capacity, 3, self.height, self.width), dtype=torch.float32)
+
+    def _resize_size(self, width: int, height: int) -> Tuple[int, int]:
+        """计算缩放后的 (width, height)，与 transformers 的 get_resize_output_image_size 一致"""
+        if "shortest_edge" in self.size:
+            target = self.size["shortest_edge"]
+            short, long = (width, height) if width <= height else (height, width)
+            new_long = int(target * long / short)
+            return (target, new_long) if width <= height else (new_long, target)
+        return self.size["width"], self.size["height"]
+
+    def _fill(self, index: int, image: Image.Image):
+        """缩放、裁剪一张图片并写入暂存区"""
+        if self.do_convert_rgb and image.mode != "RGB":
+            image = image.convert("RGB")
+
+        if self.do_resize:
+            target = self._resize_size(*image.size)
+            if image.size != target:
+                image = image.resize(target, resample=self.resample)
+
+        pixels = np.asarray(image)
+        if self.do_center_crop:
+            h, w = pixels.shape[:2]
+            if h < self.height or w < self.width:
+                raise ValueError(f"图片尺寸 {w}x{h} 小于裁剪尺寸 {self.width}x{self.height}")
+            top = (h - self.height) // 2
+            left = (w - self.width) // 2
+            pixels = pixels[top:top + self.height, left:left + self.width]
+
+        self._pixels[index] = pixels
+
+    def __call__(self, images: List[Image.Image]) -> torch.Tensor:
+        """
+        预处理一批图片
+
+        返回的张量是内部缓冲区的视图，下一次调用会覆盖其内容；
+        调用方需在同一把锁 (self.lock) 内使用完毕
+
+        Args:
+            images: PIL Image 列表
+
+        Returns:
+            pixel_values 张量 (N, 3, H, W)
+        """
+        n = len(images)
+        if n > self.capacity:
+            self._allocate(n)
+
+        for i, image in enumerate(images):
+            self._fill(i, image)
+
+        output = self._output[:n]
+        output.copy_(torch.from_numpy(self._pixels[:n]).permute(0, 3, 1, 2))
+        output.mul_(self._scale).sub_(self._shift)
+        return output
+
+    @property
+    def lock(self) -> threading.Lock:
+        """保护内部缓冲区的锁"""
+        return self._lock
+
+    def max_abs_diff(self, processor, images: List[Image.Image]) -> float:
+        """
+        与 transformers 处理器输出的最大绝对误差
+
+        Args:
+            processor: ChineseCLIPProcessor 实例
+            images: 用于比较的图片
+
+        Returns:
+            最大绝对误差
+        """
+        expected = processor(images=images, return_tensors="pt")["pixel_values"]
+        with self._lock:
+            actual = self(images).clone()
+        return float((actual - expected).abs().max())
+
+
+def verify_preprocessor(preprocessor: BatchImagePreprocessor, processor, tolerance: float) -> bool:
+    """
+    用合成图片检查快速预处理与 transformers 处理器是否一致
+
+    Args:
+        preprocessor: BatchImagePreprocessor 实例
+        processor: ChineseCLIPProcessor 实例
+        tolerance: 允许的最大绝对误差
+
+    Returns:
+        True 表示一致
+    """
+    rng = np.random.default_rng(0)
+    images = [
+        Image.fromarray(rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)),   # 横图
+        Image.fromarray(rng.integers(0, 256, (700, 300, 3), dtype=np.uint8)),   # 竖图
+        Image.fromarray(rng.integers(0, 256, (224, 224, 3), dtype=np.uint8)),   # 无需缩放
+        Image.fromarray(rng.integers(0, 256, (96, 128), dtype=np.uint8)),       # 灰度小图
+    ]
+
+    diff = preprocessor.max_abs_diff(processor, images)
+    if diff > tolerance:
+        logger.warning(f"⚠️ 快速预处理与处理器误差 {diff:.2e} 超过 {tolerance:.0e}")
+        return False
+
+    logger.info(f"✅ 快速预处理校验通过 (最大误差 {diff:.2e})")
+    return True
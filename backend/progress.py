@@ -0,0 +1,81 @@
+"""
+索引进度追踪
+统计处理速率、预计剩余时间和最近的失败记录，供状态接口和 SSE 推送使用
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Any
+
+
+class ProgressTracker:
+    """索引进度追踪器"""
+
+    def __init__(self, window: float = 30.0, max_failures: int = 20):
+        """
+        初始化追踪器
+
+        Args:
+            window: 计算速率的滑动窗口 (秒)
+            max_failures: 保留的最近失败记录数
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = deque()
+        self._failures = deque(maxlen=max_failures)
+        self.start()
+
+    def start(self, total: int = 0):
+        """开始新一轮索引"""
+        with self._lock:
+            self.started_at = time.monotonic()
+            self.current = 0
+            self.total = total
+            self.failed = 0
+            self._samples.clear()
+            self._failures.clear()
+
+    def update(self, current: int, total: int):
+        """记录进度"""
+        now = time.monotonic()
+        with self._lock:
+            self.current = current
+            self.total = total
+            self._samples.append((now, current))
+            # 只保留窗口内的样本 (至少保留两个用于计算速率)
+            while len(self._samples) > 2 and now - self._samples[0][0] > self.window:
+                self._samples.popleft()
+
+    def record_failure(self, path: str, error: str):
+        """记录失败的图片"""
+        with self._lock:
+            self.failed += 1
+            self._failures.append({"path": path, "error": error, "time": time.time()})
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        获取当前进度快照
+
+        Returns:
+            包含 progress/total/rate/eta_seconds/failed/recent_failures 的字典
+        """
+        with self._lock:
+            rate = 0.0
+            if len(self._samples) >= 2:
+                (t0, c0), (t1, c1) = self._samples[0], self._samples[-1]
+                if t1 > t0:
+                    rate = (c1 - c0) / (t1 - t0)
+
+            remaining = max(0, self.total - self.current)
+            eta = remaining / rate if rate > 0 else None
+
+            return {
+                "progress": self.current,
+                "total": self.total,
+                "rate": round(rate, 2),
+                "eta_seconds": round(eta) if eta is not None else None,
+                "elapsed_seconds": round(time.monotonic() - self.started_at),
+                "failed": self.failed,
+                "recent_failures": list(self._failures)
+            }
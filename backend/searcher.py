@@ -4,12 +4,23 @@
 """
 
 import logging
-from typing import List, Dict, Any
-from .config import TOP_K, SIMILARITY_THRESHOLD
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+from .config import (
+    TOP_K, SIMILARITY_THRESHOLD,
+    ENABLE_CACHE, CACHE_SIZE, CURSOR_DEPTH, CURSOR_TTL_SECONDS
+)
 
 logger = logging.getLogger(__name__)
 
 
+class InvalidCursorError(ValueError):
+    """分页游标无效或已过期"""
+
+
 class ImageSearcher:
     """图片搜索引擎"""
     
@@ -24,6 +35,10 @@ class ImageSearcher:
         self.model = model_manager
         self.db = vector_db
         self.logger = logging.getLogger(__name__)
+        
+        # 分页游标缓存: token -> 排好序的候选结果
+        self._cursors = OrderedDict()
+        self._cursor_lock = threading.Lock()
     
     def search(self, query_text: str, top_k: int = TOP_K, threshold: float = SIMILARITY_THRESHOLD) -> List[Dict[str, Any]]:
         """
@@ -48,10 +63,12 @@ class ImageSearcher:
             query_embedding = self.model.encode_text(query_text)
             
             # 向量检索
+            # 只检索与当前文本编码器同一模型生成的集合
             results = self.db.search(
                 query_embedding=query_embedding.tolist(),
                 top_k=top_k,
-                threshold=threshold
+                threshold=threshold,
+                model_name=self.model.get_info()["model_name"]
             )
             
             self.logger.info(f"✅ 找到 {len(results)} 个相关结果")
@@ -61,6 +78,86 @@ class ImageSearcher:
             self.logger.error(f"❌ 搜索失败: {e}")
             raise
     
+    def search_page(self, query_text: str, page_size: int = TOP_K, threshold: float = SIMILARITY_THRESHOLD,
+                    cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        分页搜索
+        
+        首次请求按 CURSOR_DEPTH 计算一次较深的候选列表并缓存在游标下，
+        后续页直接从缓存切片，不再编码文本或检索向量库
+        
+        Args:
+            query_text: 中文查询文本
+            page_size: 每页结果数量
+            threshold: 相似度阈值 (仅首次请求生效)
+            cursor: 上一页返回的游标，为空时发起新搜索
+            
+        Returns:
+            {'results', 'next_cursor', 'total'}
+            
+        Raises:
+            InvalidCursorError: 游标无效、已过期或与查询不匹配
+        """
+        if cursor:
+            token, offset = self._parse_cursor(cursor)
+            results = self._get_cursor(token, query_text)
+        else:
+            results = self.search(query_text, top_k=max(CURSOR_DEPTH, page_size), threshold=threshold)
+            token, offset = None, 0
+        
+        page = results[offset:offset + page_size]
+        next_offset = offset + len(page)
+        next_cursor = None
+        
+        if next_offset < len(results) and ENABLE_CACHE:
+            # 结果超过一页时才缓存
+            if token is None:
+                token = self._store_cursor(query_text, results)
+            next_cursor = f"{token}.{next_offset}"
+        
+        return {
+            'results': page,
+            'next_cursor': next_cursor,
+            'total': len(results)
+        }
+    
+    def _parse_cursor(self, cursor: str) -> Tuple[str, int]:
+        """解析游标 '<token>.<offset>'"""
+        token, _, offset = cursor.rpartition(".")
+        if not token or not offset.isdigit():
+            raise InvalidCursorError(f"无效的游标: {cursor}")
+        return token, int(offset)
+    
+    def _store_cursor(self, query_text: str, results: List[Dict[str, Any]]) -> str:
+        """缓存候选列表并返回游标 token (超过 CACHE_SIZE 时淘汰最久未用的)"""
+        token = secrets.token_urlsafe(12)
+        with self._cursor_lock:
+            self._cursors[token] = {
+                'query': query_text,
+                'results': results,
+                'expires': time.monotonic() + CURSOR_TTL_SECONDS
+            }
+            while len(self._cursors) > CACHE_SIZE:
+                self._cursors.popitem(last=False)
+        return token
+    
+    def _get_cursor(self, token: str, query_text: str) -> List[Dict[str, Any]]:
+        """读取缓存的候选列表"""
+        now = time.monotonic()
+        with self._cursor_lock:
+            # 顺带清理过期游标
+            for expired in [t for t, e in self._cursors.items() if e['expires'] < now]:
+                del self._cursors[expired]
+            
+            entry = self._cursors.get(token)
+            if entry is None:
+                raise InvalidCursorError("游标已过期，请重新搜索")
+            if entry['query'] != query_text:
+                raise InvalidCursorError("游标与查询不匹配")
+            
+            self._cursors.move_to_end(token)
+            return entry['results']
+    
     def search_batch(self, queries: List[str], top_k: int = TOP_K) -> Dict[str, List[Dict[str, Any]]]:
         """
         批量搜索
@@ -0,0 +1,182 @@
+"""
+分布式索引 worker
+从协调器领取工作单元，本地解码并编码图片，把向量回传给协调器；
+worker 不访问向量数据库
+
+用法:
+    python -m backend.worker --coordinator http://host:8000
+"""
+
+import argparse
+import io
+import json
+import logging
+import socket
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Optional
+from urllib import request as urlrequest
+from urllib.error import HTTPError
+
+from .config import BATCH_SIZE, DECODE_SHORT_SIDE
+from .indexer import load_image
+
+logger = logging.getLogger(__name__)
+
+
+class IndexWorker:
+    """分布式索引 worker"""
+
+    def __init__(self, coordinator_url: str, model_manager, worker_id: Optional[str] = None,
+                 batch_size: int = BATCH_SIZE):
+        """
+        初始化 worker
+
+        Args:
+            coordinator_url: 协调器地址，例如 http://host:8000
+            model_manager: CLIPModelManager 实例
+            worker_id: worker 标识，默认为 主机名-随机后缀
+            batch_size: 编码批次大小
+        """
+        self.base_url = coordinator_url.rstrip("/")
+        self.model = model_manager
+        self.model_name = model_manager.get_info()["model_name"]
+        self.worker_id = worker_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}"
+        self.batch_size = max(1, batch_size)
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """向协调器发送 JSON 请求"""
+        req = urlrequest.Request(
+            self.base_url + path,
+            data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urlrequest.urlopen(req, timeout=120) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+
+    def _open_image(self, item: Dict[str, Any]):
+        """优先读取本地文件，本地不可见时从协调器下载"""
+        path = Path(item["path"])
+        if path.exists():
+            return load_image(path, DECODE_SHORT_SIDE)[0]
+        if not item.get("url"):
+            raise FileNotFoundError(f"本地不存在且协调器未提供下载地址: {path}")
+
+        with urlrequest.urlopen(self.base_url + urlrequest.quote(item["url"]), timeout=120) as resp:
+            return load_image(io.BytesIO(resp.read()), DECODE_SHORT_SIDE)[0]
+
+    def process_unit(self, unit: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        处理一个工作单元
+
+        Returns:
+            提交给协调器的 {'results', 'failures'}
+        """
+        results = []
+        failures = []
+        items = unit["items"]
+
+        for start in range(0, len(items), self.batch_size):
+            batch = []
+            for item in items[start:start + self.batch_size]:
+                try:
+                    batch.append((item["path"], self._open_image(item)))
+                except Exception as e:
+                    logger.warning(f"读取失败 {item['path']}: {e}")
+                    failures.append({"path": item["path"], "error": f"解码失败: {e}"})
+
+            if not batch:
+                continue
+
+            try:
+                embeddings = self.model.encode_images([image for _, image in batch])
+                results.extend(
+                    {"path": path, "embedding": embedding.tolist()}
+                    for (path, _), embedding in zip(batch, embeddings)
+                )
+            except Exception as e:
+                logger.error(f"批量编码失败 ({len(batch)} 张): {e}")
+                failures.extend({"path": path, "error": "编码失败"} for path, _ in batch)
+
+        return {"results": results, "failures": failures}
+
+    def run(self, poll_interval: float = 5.0, exit_when_idle: bool = False):
+        """
+        持续领取并处理工作单元
+
+        Args:
+            poll_interval: 没有可领取单元时的轮询间隔 (秒)
+            exit_when_idle: 没有进行中的任务时退出
+        """
+        logger.info(f"🛠️ worker {self.worker_id} 已启动，协调器: {self.base_url}，模型: {self.model_name}")
+        identity = {"worker_id": self.worker_id, "model_name": self.model_name}
+
+        while True:
+            try:
+                response = self._post("/api/workers/lease", identity)
+            except HTTPError as e:
+                if e.code == 409:
+                    # 模型不一致，继续运行只会产生被拒绝的结果
+                    logger.error(f"❌ 协调器拒绝: {e.read().decode('utf-8', 'replace')}")
+                    return
+                logger.warning(f"领取工作单元失败: {e}")
+                time.sleep(poll_interval)
+                continue
+            except OSError as e:
+                logger.warning(f"无法连接协调器: {e}")
+                time.sleep(poll_interval)
+                continue
+
+            unit = response.get("unit")
+            if unit is None:
+                if exit_when_idle and not response.get("job_active"):
+                    logger.info("没有进行中的任务，worker 退出")
+                    return
+                time.sleep(poll_interval)
+                continue
+
+            started = time.monotonic()
+            outcome = self.process_unit(unit)
+
+            try:
+                self._post("/api/workers/complete", {**identity, "unit_id": unit["unit_id"], **outcome})
+                logger.info(
+                    f"单元 {unit['unit_id']} 完成: 成功 {len(outcome['results'])}，"
+                    f"失败 {len(outcome['failures'])}，耗时 {time.monotonic() - started:.1f}s"
+                )
+            except HTTPError as e:
+                # 租约超时后单元已被重新分配，结果由新的持有者提交
+                logger.warning(f"单元 {unit['unit_id']} 提交被拒绝: {e.read().decode('utf-8', 'replace')}")
+            except OSError as e:
+                logger.warning(f"单元 {unit['unit_id']} 提交失败，租约到期后将重新分配: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MemoryHunter 分布式索引 worker")
+    parser.add_argument("--coordinator", required=True, help="协调器地址，例如 http://host:8000")
+    parser.add_argument("--worker-id", default=None, help="worker 标识 (默认: 主机名-随机后缀)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="编码批次大小")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="空闲时轮询间隔 (秒)")
+    parser.add_argument("--exit-when-idle", action="store_true", help="没有进行中的任务时退出")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    from .models import CLIPModelManager
+
+    worker = IndexWorker(
+        coordinator_url=args.coordinator,
+        model_manager=CLIPModelManager(),
+        worker_id=args.worker_id,
+        batch_size=args.batch_size
+    )
+    worker.run(poll_interval=args.poll_interval, exit_when_idle=args.exit_when_idle)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+持久化工作队列 (SQLite)
+把扫描到的图片切分为带租约的工作单元，供分布式 worker 领取；
+租约超时的单元会被重新分配，无需外部服务
+"""
+
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    rebuild INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    skipped INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL REFERENCES jobs(id),
+    paths TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    success INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_units_job_status ON units(job_id, status);
+"""
+
+# 旧版本数据库缺少的列: (表, 列, 定义)
+MIGRATIONS = [
+    ("jobs", "skipped", "INTEGER NOT NULL DEFAULT 0"),
+    ("units", "success", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+# 工作单元状态
+UNIT_PENDING = "pending"
+UNIT_LEASED = "leased"
+UNIT_DONE = "done"
+UNIT_FAILED = "failed"
+
+# 任务状态
+JOB_RUNNING = "running"
+JOB_FINISHED = "finished"
+JOB_CANCELLED = "cancelled"
+
+
+class WorkQueue:
+    """基于 SQLite 的租约工作队列"""
+
+    def __init__(self, db_path: Path, lease_seconds: float = 300.0, max_attempts: int = 3):
+        """
+        初始化队列
+
+        Args:
+            db_path: SQLite 文件路径
+            lease_seconds: 租约时长，超时未完成的单元会重新分配
+            max_attempts: 单元最多被领取的次数，超过后标记为失败
+        """
+        self.db_path = Path(db_path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            for table, column, definition in MIGRATIONS:
+                columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    @contextmanager
+    def _connect(self):
+        """打开连接 (每次操作独立连接，便于多线程调用)"""
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def create_job(self, paths: List[str], unit_size: int, rebuild: bool = False, skipped: int = 0) -> str:
+        """
+        创建任务并切分工作单元
+
+        Args:
+            paths: 待索引的图片路径
+            unit_size: 每个单元包含的图片数
+            rebuild: 是否为影子重建任务
+            skipped: 扫描到但已索引、无需处理的图片数 (与 paths 一起构成任务总数)
+
+        Returns:
+            任务 ID
+        """
+        job_id = uuid.uuid4().hex
+        unit_size = max(1, unit_size)
+        units = [
+            (job_id, json.dumps(paths[i:i + unit_size], ensure_ascii=False), len(paths[i:i + unit_size]))
+            for i in range(0, len(paths), unit_size)
+        ]
+
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO jobs (id, created_at, rebuild, status, total, skipped) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, time.time(), int(rebuild), JOB_RUNNING, len(paths) + skipped, skipped)
+            )
+            conn.executemany("INSERT INTO units (job_id, paths, size) VALUES (?, ?, ?)", units)
+            conn.execute("COMMIT")
+
+        logger.info(f"📦 创建任务 {job_id[:8]}: {len(paths)} 张图片，{len(units)} 个单元")
+        return job_id
+
+    def lease(self, worker_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        领取一个待处理或租约已过期的单元
+
+        Args:
+            worker_id: worker 标识
+            job_id: 任务 ID
+
+        Returns:
+            {'unit_id', 'paths', 'lease_expires'}，没有可领取单元时返回 None
+        """
+        now = time.time()
+
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 超过最大领取次数仍未完成的单元视为失败
+                conn.execute(
+                    "UPDATE units SET status = ?, lease_owner = NULL "
+                    "WHERE job_id = ? AND status = ? AND lease_expires < ? AND attempts >= ?",
+                    (UNIT_FAILED, job_id, UNIT_LEASED, now, self.max_attempts)
+                )
+                row = conn.execute(
+                    "SELECT id, paths, status, lease_owner FROM units "
+                    "WHERE job_id = ? AND (status = ? OR (status = ? AND lease_expires < ?)) "
+                    "ORDER BY id LIMIT 1",
+                    (job_id, UNIT_PENDING, UNIT_LEASED, now)
+                ).fetchone()
+
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+
+                expires = now + self.lease_seconds
+                conn.execute(
+                    "UPDATE units SET status = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    (UNIT_LEASED, worker_id, expires, row["id"])
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        if row["status"] == UNIT_LEASED:
+            logger.warning(f"单元 {row['id']} 的租约已过期 (原 worker: {row['lease_owner']})，重新分配给 {worker_id}")
+
+        return {
+            "unit_id": row["id"],
+            "paths": json.loads(row["paths"]),
+            "lease_expires": expires
+        }
+
+    def owns_lease(self, unit_id: int, worker_id: str, job_id: str) -> bool:
+        """检查任务中的单元当前是否仍由该 worker 持有 (过期但未被重新领取也算持有)"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT status, lease_owner FROM units WHERE id = ? AND job_id = ?", (unit_id, job_id)
+            ).fetchone()
+        return row is not None and row["status"] == UNIT_LEASED and row["lease_owner"] == worker_id
+
+    def unit_paths(self, unit_id: int, job_id: str) -> List[str]:
+        """获取任务中单元包含的图片路径 (单元不存在时返回空列表)"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT paths FROM units WHERE id = ? AND job_id = ?", (unit_id, job_id)
+            ).fetchone()
+        return json.loads(row["paths"]) if row else []
+
+    def complete(self, unit_id: int, worker_id: str, job_id: str, success: int = 0) -> bool:
+        """
+        标记单元完成
+
+        Args:
+            unit_id: 单元 ID
+            worker_id: worker 标识
+            job_id: 任务 ID
+            success: 单元中成功写入的图片数 (持久化以便重启后恢复统计)
+
+        Returns:
+            True 表示成功，False 表示租约已不属于该 worker
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE units SET status = ?, lease_expires = NULL, success = ? "
+                "WHERE id = ? AND job_id = ? AND status = ? AND lease_owner = ?",
+                (UNIT_DONE, success, unit_id, job_id, UNIT_LEASED, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def get_active_job(self) -> Optional[Dict[str, Any]]:
+        """获取正在运行的任务"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT 1",
+                (JOB_RUNNING,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def set_job_status(self, job_id: str, status: str):
+        """更新任务状态"""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ? WHERE id = ?", (status, job_id))
+
+    def cancel_job(self, job_id: str):
+        """取消任务，并将其未完成的单元标记为失败 (旧租约的结果不再被接受)"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("UPDATE jobs SET status = ? WHERE id = ?", (JOB_CANCELLED, job_id))
+                conn.execute(
+                    "UPDATE units SET status = ?, lease_owner = NULL, lease_expires = NULL "
+                    "WHERE job_id = ? AND status IN (?, ?)",
+                    (UNIT_FAILED, job_id, UNIT_PENDING, UNIT_LEASED)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def job_progress(self, job_id: str) -> Dict[str, int]:
+        """
+        统计任务各状态的单元数和已处理图片数
+
+        Returns:
+            {'pending', 'leased', 'done', 'failed', 'units', 'processed', 'success'}
+        """
+        counts = {UNIT_PENDING: 0, UNIT_LEASED: 0, UNIT_DONE: 0, UNIT_FAILED: 0}
+        processed = 0
+        success = 0
+        with self._connect() as conn:
+            for row in conn.execute(
+                "SELECT status, COUNT(*) AS n, SUM(size) AS photos, SUM(success) AS success "
+                "FROM units WHERE job_id = ? GROUP BY status",
+                (job_id,)
+            ):
+                counts[row["status"]] = row["n"]
+                if row["status"] in (UNIT_DONE, UNIT_FAILED):
+                    processed += row["photos"]
+                success += row["success"]
+        counts["units"] = sum(counts.values())
+        counts["processed"] = processed
+        counts["success"] = success
+        return counts
+
+    def failed_paths(self, job_id: str) -> List[str]:
+        """获取失败单元中的所有图片路径"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT paths FROM units WHERE job_id = ? AND status = ?",
+                (job_id, UNIT_FAILED)
+            ).fetchall()
+        return [path for row in rows for path in json.loads(row["paths"])]
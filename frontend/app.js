@@ -26,6 +26,7 @@ const elements = {
     resultsSection: document.getElementById('resultsSection'),
     resultsCount: document.getElementById('resultsCount'),
     resultsGrid: document.getElementById('resultsGrid'),
+    resultsSentinel: document.getElementById('resultsSentinel'),
 
     // 加载动画
     loadingOverlay: document.getElementById('loadingOverlay')
@@ -38,8 +39,8 @@ document.addEventListener('DOMContentLoaded', () => {
     // 加载统计信息
     loadStats();
 
-    // 定期刷新统计
-    setInterval(loadStats, 5000);
+    // 订阅索引进度推送 (替代定时轮询)
+    watchIndexEvents();
 
     // 监听滑块变化
     elements.topK.addEventListener('input', (e) => {
@@ -56,6 +57,9 @@ document.addEventListener('DOMContentLoaded', () => {
     // 监听搜索表单
     elements.searchForm.addEventListener('submit', handleSearch);
 
+    // 滚动到结果末尾时加载下一页
+    initInfiniteScroll();
+
     // 初始化语言切换
     initLanguageSwitcher();
 });
@@ -78,20 +82,7 @@ async function loadStats() {
         updateGauge(totalImages, 500);
 
         // 更新索引状态
-        if (data.indexing_status.is_indexing) {
-            elements.indexStatus.textContent = i18n.t('indexingNow');
-            elements.indexStatus.classList.add('status-indexing');
-
-            // 显示进度
-            showProgress(
-                data.indexing_status.progress,
-                data.indexing_status.total
-            );
-        } else {
-            elements.indexStatus.textContent = i18n.t('systemStatus');
-            elements.indexStatus.classList.remove('status-indexing');
-            hideProgress();
-        }
+        renderIndexStatus(data.indexing_status);
 
     } catch (error) {
         console.error('加载统计信息失败:', error);
@@ -138,12 +129,9 @@ async function handleIndex() {
 
         const data = await response.json();
 
-        // 显示成功消息
+        // 显示成功消息 (进度由 SSE 推送更新)
         showNotification(i18n.t('indexTaskStarted'), 'success');
 
-        // 开始轮询状态
-        pollIndexStatus();
-
     } catch (error) {
         console.error('启动索引失败:', error);
         showNotification(`索引启动失败: ${error.message}`, 'error');
@@ -153,33 +141,112 @@ async function handleIndex() {
 }
 
 /**
- * 轮询索引状态
+ * 订阅索引进度 (Server-Sent Events)
+ * 服务端节流推送，断线后 EventSource 会自动重连
  */
-function pollIndexStatus() {
-    const interval = setInterval(async () => {
-        try {
-            const response = await fetch(`${API_BASE}/api/index/status`);
-            const status = await response.json();
-
-            if (status.is_indexing) {
-                showProgress(status.progress, status.total);
-                elements.indexBtnText.textContent = i18n.t("indexingProgress", { current: status.progress, total: status.total });
-            } else {
-                clearInterval(interval);
-                hideProgress();
-                elements.indexBtn.disabled = false;
-                elements.indexBtnText.textContent = i18n.t('startIndex');
+let indexEvents = null;
+let wasIndexing = false;
 
-                // 刷新统计
-                loadStats();
-            }
-        } catch (error) {
-            console.error('获取索引状态失败:', error);
-            clearInterval(interval);
-            elements.indexBtn.disabled = false;
-            elements.indexBtnText.textContent = i18n.t('startIndex');
+function watchIndexEvents() {
+    if (indexEvents) return;
+
+    indexEvents = new EventSource(`${API_BASE}/api/index/events`);
+
+    indexEvents.addEventListener('progress', (e) => {
+        const status = JSON.parse(e.data);
+        elements.indexStatus.classList.remove('status-error');
+        renderIndexStatus(status);
+
+        // 索引期间同步图片总数
+        if (status.total_images != null) {
+            elements.totalImages.textContent = status.total_images;
+            updateGauge(status.total_images, 500);
+        }
+
+        // 索引结束后刷新统计
+        if (wasIndexing && !status.is_indexing) {
+            loadStats();
         }
-    }, 1000);
+        wasIndexing = status.is_indexing;
+    });
+
+    indexEvents.onerror = () => {
+        console.error('索引进度连接中断，正在重连...');
+        elements.indexStatus.textContent = i18n.t('connectionFailed');
+        elements.indexStatus.classList.add('status-error');
+    };
+}
+
+/**
+ * 渲染索引状态
+ */
+function renderIndexStatus(status) {
+    if (status.is_indexing) {
+        elements.indexStatus.textContent = i18n.t('indexingNow');
+        elements.indexStatus.classList.add('status-indexing');
+
+        elements.indexBtn.disabled = true;
+        elements.indexBtnText.textContent = i18n.t('indexingProgress', { current: status.progress, total: status.total });
+
+        showProgress(status.progress, status.total, status);
+    } else {
+        elements.indexStatus.textContent = i18n.t('systemStatus');
+        elements.indexStatus.classList.remove('status-indexing');
+
+        elements.indexBtn.disabled = false;
+        elements.indexBtnText.textContent = i18n.t('startIndex');
+
+        hideProgress();
+    }
+}
+
+/**
+ * 格式化剩余时间 (秒 -> h:mm:ss / m:ss)
+ */
+function formatDuration(seconds) {
+    const h = Math.floor(seconds / 3600);
+    const m = Math.floor((seconds % 3600) / 60);
+    const s = Math.floor(seconds % 60).toString().padStart(2, '0');
+    return h > 0 ? `${h}:${m.toString().padStart(2, '0')}:${s}` : `${m}:${s}`;
+}
+
+/**
+ * 当前搜索的分页状态
+ */
+const searchState = {
+    query: '',
+    topK: 20,
+    threshold: 0,
+    nextCursor: null,
+    loading: false,
+    rendered: 0,
+    // 每次新搜索递增，用于丢弃旧搜索仍在途中的响应
+    generation: 0
+};
+
+/**
+ * 请求一页搜索结果 (cursor 为空时发起新搜索)
+ */
+async function fetchSearchPage(cursor = null) {
+    const response = await fetch(`${API_BASE}/api/search`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            query: searchState.query,
+            top_k: searchState.topK,
+            threshold: searchState.threshold,
+            cursor: cursor
+        })
+    });
+
+    if (!response.ok) {
+        const error = await response.json();
+        throw new Error(error.detail);
+    }
+
+    return response.json();
 }
 
 /**
@@ -194,60 +261,109 @@ async function handleSearch(e) {
         return;
     }
 
-    const topK = parseInt(elements.topK.value);
-    const threshold = parseFloat(elements.threshold.value);
+    searchState.query = query;
+    searchState.topK = parseInt(elements.topK.value);
+    searchState.threshold = parseFloat(elements.threshold.value);
+    searchState.nextCursor = null;
+    searchState.rendered = 0;
+    const generation = ++searchState.generation;
 
     try {
         // 显示加载动画
         elements.loadingOverlay.style.display = 'flex';
+        searchState.loading = true;
 
-        const response = await fetch(`${API_BASE}/api/search`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                query: query,
-                top_k: topK,
-                threshold: threshold
-            })
-        });
-
-        if (!response.ok) {
-            const error = await response.json();
-            throw new Error(error.detail);
-        }
-
-        const data = await response.json();
+        const data = await fetchSearchPage();
+        if (generation !== searchState.generation) return;
 
         // 显示结果
         displayResults(data);
 
     } catch (error) {
+        if (generation !== searchState.generation) return;
         console.error('搜索失败:', error);
         showNotification(`搜索失败: ${error.message}`, 'error');
     } finally {
-        // 隐藏加载动画
-        elements.loadingOverlay.style.display = 'none';
+        if (generation === searchState.generation) {
+            // 隐藏加载动画
+            elements.loadingOverlay.style.display = 'none';
+            searchState.loading = false;
+            maybeLoadMore();
+        }
     }
 }
 
+/**
+ * 加载下一页结果 (从服务端缓存的候选列表中读取，不重新检索)
+ */
+async function loadNextPage() {
+    if (searchState.loading || !searchState.nextCursor) return;
+
+    const generation = searchState.generation;
+    searchState.loading = true;
+    try {
+        const data = await fetchSearchPage(searchState.nextCursor);
+        // 期间已发起新搜索: 丢弃旧结果，避免旧游标覆盖新搜索的游标
+        if (generation !== searchState.generation) return;
+        appendResults(data);
+    } catch (error) {
+        if (generation !== searchState.generation) return;
+        // 游标过期等情况: 停止继续加载
+        console.error('加载更多结果失败:', error);
+        searchState.nextCursor = null;
+        showNotification(`搜索失败: ${error.message}`, 'error');
+    } finally {
+        if (generation === searchState.generation) {
+            searchState.loading = false;
+            maybeLoadMore();
+        }
+    }
+}
+
+/**
+ * 一页结果不足以填满屏幕时继续加载 (此时触发点不会再次进入视口)
+ */
+function maybeLoadMore() {
+    if (!elements.resultsSentinel || !searchState.nextCursor) return;
+
+    const rect = elements.resultsSentinel.getBoundingClientRect();
+    if (rect.top < window.innerHeight + 400) {
+        loadNextPage();
+    }
+}
+
+/**
+ * 初始化无限滚动
+ */
+function initInfiniteScroll() {
+    if (!elements.resultsSentinel || !('IntersectionObserver' in window)) return;
+
+    const observer = new IntersectionObserver((entries) => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadNextPage();
+        }
+    }, { rootMargin: '400px' });
+
+    observer.observe(elements.resultsSentinel);
+}
+
 /**
  * 显示搜索结果
  */
 function displayResults(data) {
-    const { query, results, count } = data;
+    const { query, results, count, total } = data;
 
     // 显示结果区域
     elements.resultsSection.style.display = 'block';
 
     // 更新结果计数
-    elements.resultsCount.textContent = `找到 ${count} 个相关结果，查询: "${query}"`;
+    elements.resultsCount.textContent = i18n.t('resultsQuery', { count: total ?? count, query: query });
 
     // 清空之前的结果
     elements.resultsGrid.innerHTML = '';
 
     if (count === 0) {
+        searchState.nextCursor = null;
         elements.resultsGrid.innerHTML = `
             <div style="grid-column: 1/-1; text-align: center; padding: 3rem; color: var(--text-muted);">
                 <p style="font-size: 3rem; margin-bottom: 1rem;">🔍</p>
@@ -259,13 +375,23 @@ function displayResults(data) {
     }
 
     // 渲染结果卡片
-    results.forEach((result, index) => {
+    appendResults(data);
+
+    // 滚动到结果区域
+    elements.resultsSection.scrollIntoView({ behavior: 'smooth', block: 'start' });
+}
+
+/**
+ * 追加一页结果卡片
+ */
+function appendResults(data) {
+    data.results.forEach((result, index) => {
         const card = createResultCard(result, index);
         elements.resultsGrid.appendChild(card);
     });
 
-    // 滚动到结果区域
-    elements.resultsSection.scrollIntoView({ behavior: 'smooth', block: 'start' });
+    searchState.rendered += data.results.length;
+    searchState.nextCursor = data.next_cursor;
 }
 
 /**
@@ -309,12 +435,28 @@ function createResultCard(result, index) {
 /**
  * 显示进度条
  */
-function showProgress(current, total) {
+function showProgress(current, total, status = {}) {
     elements.indexProgress.style.display = 'block';
 
     const percentage = total > 0 ? (current / total) * 100 : 0;
     elements.progressFill.style.width = `${percentage}%`;
-    elements.progressText.textContent = `${current} / ${total}`;
+
+    // 附加吞吐量、剩余时间和失败数
+    const parts = [`${current} / ${total}`];
+    if (status.rate > 0) {
+        parts.push(i18n.t('indexRate', { rate: status.rate.toFixed(1) }));
+    }
+    if (status.eta_seconds != null) {
+        parts.push(i18n.t('indexEta', { eta: formatDuration(status.eta_seconds) }));
+    }
+    if (status.failed > 0) {
+        parts.push(i18n.t('indexFailedCount', { count: status.failed }));
+    }
+    elements.progressText.textContent = parts.join(' · ');
+
+    // 最近失败的图片放在提示中
+    const failures = status.recent_failures || [];
+    elements.progressText.title = failures.map(f => `${f.path}: ${f.error}`).join('\n');
 }
 
 /**
@@ -38,6 +38,9 @@ const i18n = {
             resultsQuery: '找到 {count} 个相关结果，查询: "{query}"',
             indexProgress: '已完成 {current} / {total}',
             indexingProgress: '索引中 {current}/{total}',
+            indexRate: '{rate} 张/秒',
+            indexEta: '剩余 {eta}',
+            indexFailedCount: '失败 {count}',
             folderCountText: '{count} 个文件夹',
             // Error messages & notifications
             connectionFailed: '连接失败',
@@ -89,6 +92,9 @@ const i18n = {
             resultsQuery: 'Found {count} results for: "{query}"',
             indexProgress: 'Completed {current} / {total}',
             indexingProgress: 'Indexing {current}/{total}',
+            indexRate: '{rate} img/s',
+            indexEta: '{eta} left',
+            indexFailedCount: '{count} failed',
             folderCountText: '{count} folders',
             // Error messages & notifications
             connectionFailed: 'Connection Failed',